@@ -15,7 +15,7 @@ Long description of module's purpose
     # Check https://github.com/odoo/odoo/blob/15.0/odoo/addons/base/data/ir_module_category_data.xml
     # for the full list
     'category': 'Uncategorized',
-    'version': '0.1',
+    'version': '0.6',
 
     # any module necessary for this one to work correctly
     'depends': ['base', 'web', 'mail', 'portal'],
@@ -23,6 +23,7 @@ Long description of module's purpose
     # always loaded
     'data': [
         'data/cron.xml',
+        'data/sequence.xml',
         'data/mail_template.xml',
         'security/ir.model.access.csv',
 
@@ -31,14 +32,26 @@ Long description of module's purpose
         'views/library_dashboard.xml',
 
         'views/book_views.xml',
+        'views/book_copy_views.xml',
+        'views/book_hold_views.xml',
         'views/author_views.xml',
         'views/member_views.xml',
         'views/rental_views.xml',
+        'views/rental_fee_views.xml',
+        'views/rental_notification_views.xml',
+        'views/rental_export_job_views.xml',
+        'views/circulation_event_views.xml',
+        'views/catalogue_import_views.xml',
         'reports/book_report.xml',
         'reports/report_rental_wizard.xml',
         'reports/rental_report.xml',
         'reports/rental_report_templates.xml',
     ],
+    'assets': {
+        'web.assets_backend': [
+            'library_management/static/src/js/export_job_progress.js',
+        ],
+    },
 
 }
 
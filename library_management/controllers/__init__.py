@@ -1,2 +1,2 @@
 # __init__.py at root level of your module
-from . import export_rental_xlsx_controller, portal, portal_book, dashboard
\ No newline at end of file
+from . import export_rental_xlsx_controller, portal, portal_book, dashboard, desk
\ No newline at end of file
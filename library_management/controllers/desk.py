@@ -0,0 +1,13 @@
+from odoo import http
+from odoo.http import request
+
+class LibraryDeskController(http.Controller):
+
+    @http.route('/library/desk/checkout', type='json', auth='user', methods=['POST'])
+    def desk_checkout(self, member, codes, due_date=None, **kwargs):
+        # One round trip per scanned batch, every code gets its own result
+        return request.env['library.rental']._desk_checkout(member, codes or [], due_date)
+
+    @http.route('/library/desk/return', type='json', auth='user', methods=['POST'])
+    def desk_return(self, codes, **kwargs):
+        return request.env['library.rental']._desk_return(codes or [])
@@ -1,60 +1,51 @@
 # controllers/main.py
 from odoo import http
 from odoo.http import request
-import io
-import base64
-import openpyxl
-from datetime import datetime
-from openpyxl.styles import Alignment
 
 class RentalReportController(http.Controller):
 
     @http.route('/library/export_rental_xlsx', type='http', auth='user')
     def export_rental_xlsx(self, start_date=None, end_date=None, state=None, **kwargs):
-        # Filter data
-        Rental = request.env['library.rental'].sudo()
-        domain = []
-        if start_date and end_date:
-            domain.append(('rental_date', '>=', start_date))
-            domain.append(('rental_date', '<=', end_date))
-        if state:
-            state_list = state.split(',')  # Convert from "draft,confirmed"
-            domain.append(('state', 'in', state_list))
-
-        rentals = Rental.search(domain)
-
-        # Create XLSX
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Rental Report'
-        ws.append(['Book', 'Due Date', 'Member', 'Rental Date', 'Rental Fee', 'Return Date', 'Status'])
-
-        ws.column_dimensions['A'].width = 30  # Book Title
-        ws.column_dimensions['B'].width = 30  # Date
-        ws.column_dimensions['C'].width = 30  # Customer
-        ws.column_dimensions['D'].width = 30  # Start
-        ws.column_dimensions['E'].width = 30  # Fee
-        ws.column_dimensions['F'].width = 30  # Return
-        ws.column_dimensions['G'].width = 30  # State
-
-        for r in rentals:
-            book_title = ', '.join(r.book_ids.mapped('title'))
-            ws.append([book_title, r.due_date, r.member_id.name, r.rental_date, r.rental_fee, r.return_date, r.state])
-
-        wrap_alignment = Alignment(wrap_text=True)
-        for row in ws.iter_rows(min_row=2):  # Skip header row
-            book_cell = row[0]  # Column A
-            if book_cell.value:
-                book_cell.alignment = wrap_alignment
-        fp = io.BytesIO()
-        wb.save(fp)
-        fp.seek(0)
-        xlsx_data = fp.read()
-        fp.close()
-
-        filename = f"rental_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        headers = [
-            ('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
-            ('Content-Disposition', f'attachment; filename="{filename}"')
-        ]
-        return request.make_response(xlsx_data, headers)
+        # Closed months are served from their snapshot, everything else is built by a background job
+        request.env['library.rental'].check_access('read')
+        state_list = state.split(',') if state else None  # Convert from "draft,confirmed"
+        Export = request.env['library.rental.export']
+        if Export._is_closed_period(start_date, end_date):
+            attachment = Export._get_snapshot(start_date, end_date, state_list, build=False)
+            if attachment:
+                return self._stream(attachment)
+        job = request.env['library.rental.export.job']._enqueue(start_date, end_date, state_list)
+        if job.state == 'done' and job.attachment_id:
+            return self._stream(job.attachment_id)
+        return request.make_json_response({
+            'job_id': job.id,
+            'progress_url': f"/library/export_job/{job.id}/progress",
+        }, status=202)
+
+    def _stream(self, attachment):
+        # Exports are created by the cron, once the rental rights are checked the file is read as sudo
+        return request.env['ir.binary']._get_stream_from(attachment.sudo()).get_response(as_attachment=True)
+
+    @http.route('/library/export_job/<int:job_id>/download', type='http', auth='user', methods=['GET'])
+    def export_job_download(self, job_id, **kwargs):
+        job = request.env['library.rental.export.job'].browse(job_id).exists()
+        if not job or job.state != 'done' or not job.attachment_id:
+            return request.not_found()
+        job.check_access('read')
+        request.env['library.rental'].check_access('read')
+        return self._stream(job.attachment_id)
+
+    @http.route('/library/export_job/<int:job_id>/progress', type='http', auth='user', methods=['GET'])
+    def export_job_progress(self, job_id, **kwargs):
+        # Polled by the UI while a background export is running
+        job = request.env['library.rental.export.job'].browse(job_id).exists()
+        if not job:
+            return request.not_found()
+        return request.make_json_response({
+            'state': job.state,
+            'rows_done': job.rows_done,
+            'rows_total': job.rows_total,
+            'progress': job.progress,
+            'download_url': job._get_download_url() if job.attachment_id else None,
+            'error': job.error,
+        })
@@ -1,18 +1,54 @@
 from odoo.addons.portal.controllers.portal import CustomerPortal
 from odoo.http import request
-from odoo import http
+from odoo import http, fields
+from urllib.parse import urlencode
 
 class LibraryPortal(CustomerPortal):
 
+    def _get_rental_domain(self):
+        # Portal users only see the rentals of the members linked to their contact
+        if request.env.user._is_internal():
+            return []
+        members = request.env['library.member'].sudo().search([('partner_id', '=', request.env.user.partner_id.id)])
+        return [('member_id', 'in', members.ids)]
 
     @http.route(['/my/library/rental'], type='http', website=True)
-    def libraryListView(self, **kw):
-        rentals = request.env['library.rental'].sudo().search([])
-        return request.render('library_management.library_rental_list_view_portal', {'rentals': rentals, 'page_name': 'rental_list_view'})
-    @http.route(['/my/library/rental/<model("library.rental"):rental_id>'], type='http', website=True)
+    def libraryListView(self, sort='newest', state=None, date_from=None, date_to=None, after=None, before=None, **kw):
+        Rental = request.env['library.rental'].sudo()
+        states = Rental._fields['state']._description_selection(request.env)
+        filters = {'sort': 'oldest' if sort == 'oldest' else 'newest'}
+
+        domain = self._get_rental_domain()
+        if state in dict(states):
+            domain.append(('state', '=', state))
+            filters['state'] = state
+        for name, operator, value in (('date_from', '>=', date_from), ('date_to', '<=', date_to)):
+            try:
+                value = fields.Date.to_date(value)
+            except ValueError:
+                value = None
+            if value:
+                domain.append(('rental_date', operator, value))
+                filters[name] = value
+
+        page = Rental._get_portal_page(domain, filters['sort'], after=after, before=before)
+        return request.render('library_management.library_rental_list_view_portal', {
+            'rows': page['rows'],
+            'states': states,
+            'filters': filters,
+            'currency': request.env.company.currency_id,
+            'prev_url': page['prev_cursor'] and '/my/library/rental?' + urlencode(dict(filters, before=page['prev_cursor'])),
+            'next_url': page['next_cursor'] and '/my/library/rental?' + urlencode(dict(filters, after=page['next_cursor'])),
+            'page_name': 'rental_list_view',
+        })
+
+    @http.route(['/my/library/rental/<int:rental_id>'], type='http', website=True)
     def libraryFormView(self, rental_id, **kw):
+        rental = request.env['library.rental'].sudo().search(self._get_rental_domain() + [('id', '=', rental_id)])
+        if not rental:
+            return request.not_found()
         vals = {
-                'rental': rental_id,
+                'rental': rental,
                 'page_name':'rental_form_view'
             }
-        return request.render('library_management.library_rental_form_view_portal', vals)
\ No newline at end of file
+        return request.render('library_management.library_rental_form_view_portal', vals)
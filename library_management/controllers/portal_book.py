@@ -1,17 +1,82 @@
-from odoo.addons.portal.controllers.portal import CustomerPortal
+from odoo.addons.portal.controllers.portal import CustomerPortal, pager as portal_pager
 from odoo.http import request
 from odoo import http
 
+# Resized variants kept by the library image mixin
+IMAGE_SIZES = (128, 256, 512, 1024, 1920)
+# Book cards per catalogue page
+BOOK_PAGE_SIZE = 24
+
 class LibraryBookPortal(CustomerPortal):
 
-    @http.route(['/my/library/book'], type='http', website=True)
-    def libraryBookListView(self, **kw):
-        books = request.env['library.book'].sudo().search([])
-        return request.render('library_management.library_book_list_view_portal', {'books': books, 'page_name': 'library_books'})
-    @http.route(['/my/library/book/<model("library.book"):book_id>'], type='http', website=True)
+    @http.route(['/my/library/book', '/my/library/book/page/<int:page>'], type='http', website=True)
+    def libraryBookListView(self, page=1, search=None, **kw):
+        # bin_size keeps the images out of the page, they are loaded from their own URL
+        Book = request.env['library.book'].sudo().with_context(bin_size=True)
+        offset = (page - 1) * BOOK_PAGE_SIZE
+        if search:
+            # Ranked, typo tolerant match on title, author, ISBN and genre
+            books, total = request.env['library.search'].sudo()._search_books(search, offset=offset, limit=BOOK_PAGE_SIZE)
+            books = books.with_context(bin_size=True)
+        else:
+            total = Book.search_count([])
+            books = Book.search([], order='title, id', offset=offset, limit=BOOK_PAGE_SIZE)
+        pager = portal_pager(
+            url='/my/library/book',
+            url_args={'search': search} if search else {},
+            total=total,
+            page=page,
+            step=BOOK_PAGE_SIZE,
+        )
+        return request.render('library_management.library_book_list_view_portal', {
+            'books': books,
+            'search': search,
+            'pager': pager,
+            'page_name': 'library_books',
+        })
+    @http.route(['/my/library/book/<int:book_id>'], type='http', website=True)
     def libraryBookFormView(self, book_id, **kw):
+        book = request.env['library.book'].sudo().with_context(bin_size=True).browse(book_id).exists()
+        if not book:
+            return request.not_found()
+        member = self._get_library_member()
+        hold = request.env['library.book.hold'].sudo().search([
+            ('member_id', '=', member.id), ('book_id', '=', book.id), ('state', 'in', ('waiting', 'ready')),
+        ], limit=1) if member else None
         vals = {
-                'book': book_id,
+                'book': book,
+                'member': member,
+                'hold': hold,
                 'page_name':'book_form_view'
             }
-        return request.render('library_management.library_book_form_view_portal', vals)
\ No newline at end of file
+        return request.render('library_management.library_book_form_view_portal', vals)
+
+    def _get_library_member(self):
+        return request.env['library.member'].sudo().search([('partner_id', '=', request.env.user.partner_id.id)], limit=1)
+
+    @http.route(['/my/library/book/<int:book_id>/hold'], type='http', auth='user', methods=['POST'], website=True)
+    def libraryBookHold(self, book_id, **kw):
+        book = request.env['library.book'].sudo().browse(book_id).exists()
+        member = self._get_library_member()
+        if not book or not member:
+            return request.not_found()
+        Hold = request.env['library.book.hold'].sudo()
+        if not Hold.search_count([('member_id', '=', member.id), ('book_id', '=', book.id), ('state', 'in', ('waiting', 'ready'))]):
+            Hold.create({'book_id': book.id, 'member_id': member.id})
+        return request.redirect(f'/my/library/book/{book.id}')
+
+    @http.route(['/library/image/<string:model>/<int:record_id>/<int:size>'], type='http', auth='user', methods=['GET'])
+    def libraryImage(self, model, record_id, size, unique=None, **kw):
+        if model not in ('library.book', 'library.member') or size not in IMAGE_SIZES:
+            return request.not_found()
+        record = request.env[model].sudo().browse(record_id).exists()
+        if not record:
+            return request.not_found()
+        # Member photos are only shown to staff and to the member itself
+        if model == 'library.member' and not request.env.user._is_internal() \
+                and record.partner_id != request.env.user.partner_id:
+            return request.not_found()
+        stream = request.env['ir.binary']._get_image_stream_from(
+            record, f'image_{size}', placeholder='library_management/static/img/book.jpg')
+        # Versioned URLs never change content, the ETag covers the others
+        return stream.get_response(immutable=bool(unique))
@@ -0,0 +1,19 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # Build the fee ledger for rentals charged before it existed
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['library.rental'].search([('state', '!=', 'draft')])._sync_fee_lines()
+    # Members without fee lines are never recomputed by the ledger, every total is taken from it once
+    Member = env['library.member'].with_context(active_test=False)
+    env.add_to_compute(Member._fields['total_rental'], Member.search([]))
+    env.flush_all()
+
+    # Books without fee lines are not recomputed and still hold the total scraped from the chatter
+    cr.execute("""
+        UPDATE library_book b
+           SET total_rental = 0
+         WHERE total_rental != 0
+           AND NOT EXISTS (SELECT 1 FROM library_rental_fee f WHERE f.book_id = b.id)
+    """)
@@ -0,0 +1,41 @@
+import logging
+import re
+from datetime import date
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    # Racing registrations could share a membership ID, unique(membership_id) cannot be created over them.
+    # The oldest member keeps the ID, the others get the next free number of the same year.
+    cr.execute("""
+        SELECT id, membership_id
+          FROM (SELECT id, membership_id, row_number() OVER (PARTITION BY membership_id ORDER BY id) AS rank
+                  FROM library_member
+                 WHERE membership_id IS NOT NULL) m
+         WHERE rank > 1
+      ORDER BY id
+    """)
+    duplicates = cr.fetchall()
+    last_numbers = {}
+    for member_id, membership_id in duplicates:
+        prefix = membership_id[:5] if re.match(r'M\d{4}', membership_id) else 'M' + str(date.today().year)
+        if prefix not in last_numbers:
+            cr.execute(
+                "SELECT COALESCE(MAX(substr(membership_id, 6)::bigint), 0) FROM library_member WHERE membership_id ~ %s",
+                (f'^{prefix}\\d+$',),
+            )
+            last_numbers[prefix] = cr.fetchone()[0]
+        last_numbers[prefix] += 1
+        new_id = f"{prefix}{last_numbers[prefix]:05d}"
+        cr.execute("UPDATE library_member SET membership_id = %s WHERE id = %s", (new_id, member_id))
+        _logger.warning("Member %s shared membership ID %s, renumbered to %s.", member_id, membership_id, new_id)
+
+    # Counters already seeded must not hand the new numbers out again
+    if not last_numbers:
+        return
+    cr.execute("SELECT to_regclass('library_sequence') IS NOT NULL")
+    if cr.fetchone()[0]:
+        for prefix, last_number in last_numbers.items():
+            cr.execute("UPDATE library_sequence SET last_number = GREATEST(last_number, %s) WHERE code = %s",
+                       (last_number, f"library.member.{prefix}"))
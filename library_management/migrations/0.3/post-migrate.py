@@ -0,0 +1,7 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # Build the daily rental rollup from the existing rentals
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['library.rental.rollup']._rebuild()
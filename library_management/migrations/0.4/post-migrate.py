@@ -0,0 +1,12 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # ISBNs saved from the form kept their dashes, the 0.6 pre-migrate normalizes them to
+    # ISBN-13 before unique(isbn) is created
+
+    # The monthly report cron is noupdate, fix its call to the new signature
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    cron = env.ref('library_management.ir_cron_auto_reminder_server_actions', raise_if_not_found=False)
+    if cron:
+        cron.code = "model.generate_and_send_report()"
@@ -0,0 +1,12 @@
+def migrate(cr, version):
+    # Link existing members to the contact with the same email, so portal users keep seeing their rentals
+    cr.execute("""
+        UPDATE library_member m
+           SET partner_id = p.id
+          FROM (SELECT DISTINCT ON (lower(email)) id, lower(email) AS email
+                  FROM res_partner
+                 WHERE email IS NOT NULL AND active
+              ORDER BY lower(email), id) p
+         WHERE m.partner_id IS NULL
+           AND lower(m.email) = p.email
+    """)
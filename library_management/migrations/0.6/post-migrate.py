@@ -0,0 +1,70 @@
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    # Every existing title becomes one copy carrying its status and borrower
+    cr.execute("""
+        INSERT INTO library_book_copy (book_id, barcode, status, member_id, create_uid, create_date, write_uid, write_date)
+             SELECT b.id, 'C' || lpad(b.id::text, 8, '0'), b.status, b.member_id,
+                    b.create_uid, now() AT TIME ZONE 'UTC', b.write_uid, now() AT TIME ZONE 'UTC'
+               FROM library_book b
+              WHERE NOT EXISTS (SELECT 1 FROM library_book_copy c WHERE c.book_id = b.id)
+    """)
+
+    # Borrowed copies belong to the latest open rental of their book
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    field = env['library.rental']._fields['book_ids']
+    cr.execute(f"""
+        UPDATE library_book_copy c
+           SET rental_id = r.rental_id
+          FROM (SELECT DISTINCT ON (rel.{field.column2}) rel.{field.column2} AS book_id, rel.{field.column1} AS rental_id
+                  FROM {field.relation} rel
+                  JOIN library_rental lr ON lr.id = rel.{field.column1}
+                 WHERE lr.state IN ('confirmed', 'active', 'overdue')
+              ORDER BY rel.{field.column2}, lr.rental_date DESC, lr.id DESC) r
+         WHERE c.book_id = r.book_id
+           AND c.status = 'borrowed'
+           AND c.rental_id IS NULL
+    """)
+
+    # Counters start from the copies, later changes are applied as increments
+    cr.execute("""
+        UPDATE library_book b
+           SET folded_copies_total = s.total,
+               folded_copies_available = s.available
+          FROM (SELECT book_id,
+                       count(*) FILTER (WHERE status != 'lost') AS total,
+                       count(*) FILTER (WHERE status = 'available') AS available
+                  FROM library_book_copy
+              GROUP BY book_id) s
+         WHERE b.id = s.book_id
+    """)
+
+    # Fee lines point at the copy that was lent
+    cr.execute("""
+        UPDATE library_rental_fee f
+           SET copy_id = c.id
+          FROM library_book_copy c
+         WHERE f.copy_id IS NULL
+           AND c.book_id = f.book_id
+           AND c.rental_id = f.rental_id
+    """)
+
+    # Rental numbers moved from the library.sequence row to a PostgreSQL sequence, it resumes after the last one
+    cr.execute("SELECT MAX(substring(name from 2)::int) FROM library_rental WHERE name ~ '^R[0-9]+$'")
+    last_number = cr.fetchone()[0] or 0
+    sequence = env.ref('library_management.seq_library_rental', raise_if_not_found=False)
+    if sequence and last_number:
+        sequence.number_next = last_number + 1
+    cr.execute("DELETE FROM library_sequence WHERE code = 'library.rental'")
+
+    # The overdue template is noupdate, its subject now lists every book title unless it was customized
+    template = env.ref('library_management.email_template_rental_overdue', raise_if_not_found=False)
+    if template and template.subject == "Overdue Book Rental: {{ object.book_ids.title }}":
+        template.subject = "Overdue Book Rental: {{ ', '.join(object.book_ids.mapped('title')) }}"
+
+    # The overdue cron checkpoint moved from the number counters to a system parameter
+    cr.execute("DELETE FROM library_sequence WHERE code = 'library.rental.overdue_checkpoint' RETURNING last_number")
+    row = cr.fetchone()
+    if row and row[0]:
+        env['ir.config_parameter'].set_param('library_management.overdue_checkpoint', row[0])
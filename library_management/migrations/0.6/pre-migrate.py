@@ -0,0 +1,45 @@
+import logging
+
+from odoo.addons.library_management.models.library_book import normalize_isbn
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    # Books are keyed by the ISBN-13 the desk and search lookups normalize to, ISBN-10 values are converted
+    cr.execute("UPDATE library_book SET isbn = NULL WHERE btrim(isbn) = ''")
+    cr.execute("SELECT id, isbn FROM library_book WHERE isbn IS NOT NULL")
+    changed, invalid = {}, []
+    for book_id, isbn in cr.fetchall():
+        normalized = normalize_isbn(isbn)
+        if not normalized:
+            invalid.append((book_id, isbn))
+        elif normalized != isbn:
+            changed[book_id] = normalized
+    if changed:
+        cr.execute("""
+            UPDATE library_book b
+               SET isbn = n.isbn
+              FROM unnest(%s::int[], %s::varchar[]) AS n(id, isbn)
+             WHERE b.id = n.id
+        """, (list(changed), list(changed.values())))
+    if invalid:
+        # Kept as typed so nothing is lost, they have to be corrected by hand
+        _logger.warning("%s book(s) have an ISBN that is not a valid ISBN-10 or ISBN-13: %s",
+                        len(invalid), ", ".join(f"{book_id}: {isbn}" for book_id, isbn in invalid))
+
+    # unique(isbn) cannot be created while two books share one
+    # The oldest book keeps the ISBN, the others lose it and can be fixed or merged by hand
+    cr.execute("""
+        UPDATE library_book b
+           SET isbn = NULL
+          FROM (SELECT id, row_number() OVER (PARTITION BY isbn ORDER BY id) AS rank
+                  FROM library_book
+                 WHERE isbn IS NOT NULL) d
+         WHERE b.id = d.id
+           AND d.rank > 1
+     RETURNING b.id
+    """)
+    cleared = [row[0] for row in cr.fetchall()]
+    if cleared:
+        _logger.warning("Cleared the duplicated ISBN of %s book(s): %s", len(cleared), cleared)
@@ -1,3 +1,3 @@
 # -*- coding: utf-8 -*-
 
-from . import models, library_book, library_author, library_member, library_rental, rental_report
+from . import models, library_sequence, library_image, library_book, library_book_copy, library_book_counter, library_book_hold, library_circulation_event, library_author, library_member, library_rental, library_rental_fee, library_rental_notification, library_dashboard, library_rental_rollup, library_search, rental_export, rental_export_job, rental_import, catalogue_import, catalogue_import_job, rental_report
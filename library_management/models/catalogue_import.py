@@ -0,0 +1,139 @@
+from odoo import models, api
+from odoo.exceptions import UserError
+from .library_author import normalize_author_name
+from .library_book import normalize_isbn
+import time
+
+CATALOGUE_LOCK_KEY = 0x4C4942434154
+
+
+class CatalogueImport(models.AbstractModel):
+    _name = 'library.catalogue.import'
+    _description = 'Catalogue bulk loader'
+
+    @api.model
+    def _load(self, file_content, file_name, chunk_size=2000, start_row=1, report=None, on_chunk=None):
+        """Upsert books by ISBN and authors by normalized name from a CSV or XLSX feed.
+
+        The first row names the columns (Title and ISBN are required, Author,
+        Publication Date, Genre and Rental Fee are optional). Each chunk costs
+        one key lookup per model, one batched create and one write per set of
+        identical changes, rows with an invalid ISBN are skipped and reported.
+        Rows up to ``start_row`` are skipped and the counters of ``report`` are
+        carried on, so a job can resume. ``on_chunk(report, last_row)`` is
+        called after every chunk. Returns the counters and the throughput.
+        """
+        started = time.monotonic()
+        rows = self.env['library.rental.import']._iter_file(file_content, file_name)
+        header = next(rows, None)
+        columns = [str(cell or '').strip().lower().replace(' ', '_') for cell in (header[1] if header else [])]
+        if 'title' not in columns or 'isbn' not in columns:
+            raise UserError("The file needs at least a Title and an ISBN column.")
+
+        report = report or {'rows': 0, 'created': 0, 'updated': 0, 'unchanged': 0, 'authors_created': 0, 'errors': []}
+        chunk = []
+        for number, row in rows:
+            if number <= start_row or not any(cell not in (None, '') for cell in row):
+                continue
+            chunk.append((number, dict(zip(columns, row))))
+            if len(chunk) >= chunk_size:
+                self._load_chunk(chunk, report)
+                if on_chunk:
+                    on_chunk(report, number)
+                chunk = []
+        if chunk:
+            self._load_chunk(chunk, report)
+            if on_chunk:
+                on_chunk(report, chunk[-1][0])
+
+        report['seconds'] = time.monotonic() - started
+        report['rows_per_second'] = report['rows'] / report['seconds'] if report['seconds'] else 0.0
+        return report
+
+    @api.model
+    def _load_chunk(self, chunk, report):
+        # One loader per chunk transaction, so two feeds cannot create the same ISBN twice
+        self.env.cr.execute("SELECT pg_advisory_xact_lock(%s)", (CATALOGUE_LOCK_KEY,))
+        Book = self.env['library.book'].with_context(tracking_disable=True)
+        Import = self.env['library.rental.import']
+        genres = {}
+        for key, label in Book._fields['genre'].selection:
+            genres[key] = genres[label.lower()] = key
+
+        # Normalize the whole chunk first, the last row of a duplicated ISBN wins
+        isbns = [normalize_isbn(values.get('isbn')) for __, values in chunk]
+        rows_by_isbn = {}
+        for (number, values), isbn in zip(chunk, isbns):
+            report['rows'] += 1
+            title = str(values.get('title') or '').strip()
+            if not isbn:
+                report['errors'].append((number, f"Invalid ISBN '{values.get('isbn') or ''}'."))
+                continue
+            if not title:
+                report['errors'].append((number, "Title is missing."))
+                continue
+            vals = {'title': title}
+            if values.get('publication_date'):
+                try:
+                    vals['publication_date'] = Import._to_date(values['publication_date'])
+                except ValueError:
+                    report['errors'].append((number, "Publication date must be in YYYY-MM-DD format."))
+                    continue
+            if values.get('genre'):
+                genre = genres.get(str(values['genre']).strip().lower())
+                if not genre:
+                    report['errors'].append((number, f"Unknown genre '{values['genre']}'."))
+                    continue
+                vals['genre'] = genre
+            if values.get('rental_fee') not in (None, ''):
+                try:
+                    vals['rental_fee'] = float(values['rental_fee'])
+                except ValueError:
+                    report['errors'].append((number, f"Invalid rental fee '{values['rental_fee']}'."))
+                    continue
+            rows_by_isbn[isbn] = (vals, str(values.get('author') or '').strip())
+        if not rows_by_isbn:
+            return
+
+        # Authors: one lookup by normalized name, one create for the missing ones
+        Author = self.env['library.author']
+        author_names = {normalize_author_name(name): name for __, name in rows_by_isbn.values() if name}
+        authors = {}
+        for author in Author.search_read([('name_normalized', 'in', list(author_names))], ['name_normalized'], order='id desc'):
+            authors[author['name_normalized']] = author['id']
+        missing = [key for key in author_names if key not in authors]
+        if missing:
+            created = Author.create([{'name': author_names[key]} for key in missing])
+            authors.update(zip(missing, created.ids))
+            report['authors_created'] += len(created)
+        for vals, author_name in rows_by_isbn.values():
+            if author_name:
+                vals['author_id'] = authors[normalize_author_name(author_name)]
+
+        # Books: one lookup by ISBN, then a batched create and the changed fields only
+        fields_to_compare = ['title', 'author_id', 'publication_date', 'genre', 'rental_fee']
+        existing = {}
+        for book in Book.search_read([('isbn', 'in', list(rows_by_isbn))], ['isbn'] + fields_to_compare, order='id desc', load=None):
+            existing[book['isbn']] = book
+        to_create = []
+        # Rows with the same changes share one write, a genre change updates the rental rollup once
+        ids_by_changes = {}
+        for isbn, (vals, __) in rows_by_isbn.items():
+            book = existing.get(isbn)
+            if not book:
+                to_create.append(dict(vals, isbn=isbn))
+                continue
+            changes = tuple(sorted((name, value) for name, value in vals.items() if book[name] != value))
+            if changes:
+                ids_by_changes.setdefault(changes, []).append(book['id'])
+                report['updated'] += 1
+            else:
+                report['unchanged'] += 1
+        for changes, book_ids in ids_by_changes.items():
+            Book.browse(book_ids).write(dict(changes))
+        if to_create:
+            Book.create(to_create)
+            report['created'] += len(to_create)
+
+        self.env.flush_all()
+        self.env.invalidate_all()
@@ -0,0 +1,117 @@
+from odoo import models, fields, api
+from datetime import timedelta
+import base64
+import contextlib
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# Skipped rows kept on the job, the counter covers all of them
+ERROR_LOG_LIMIT = 200
+
+
+class CatalogueImportJob(models.Model):
+    _name = 'library.catalogue.import.job'
+    _description = 'Background catalogue load'
+    _order = 'id desc'
+
+    name = fields.Char(string="File Name", readonly=True)
+    attachment_id = fields.Many2one('ir.attachment', string="File", readonly=True, ondelete='set null')
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="Status", default='queued', required=True, index=True)
+    last_row = fields.Integer(string="Last Row Loaded", readonly=True,
+                              help="File row of the last committed chunk, a restarted job resumes after it.")
+    rows = fields.Integer(string="Rows", readonly=True)
+    created = fields.Integer(string="Books Created", readonly=True)
+    updated = fields.Integer(string="Books Updated", readonly=True)
+    unchanged = fields.Integer(string="Books Unchanged", readonly=True)
+    authors_created = fields.Integer(string="Authors Created", readonly=True)
+    error_count = fields.Integer(string="Rows Skipped", readonly=True)
+    error_log = fields.Text(string="Skipped Rows", readonly=True)
+    error = fields.Text(string="Error", readonly=True)
+    user_id = fields.Many2one('res.users', string="Requested by", default=lambda self: self.env.user)
+
+    @api.model
+    def _enqueue(self, file_content, file_name):
+        job = self.create({'name': file_name})
+        # The file belongs to the job, the cron reads it back chunk by chunk
+        job.attachment_id = self.env['ir.attachment'].create({
+            'name': file_name,
+            'datas': base64.b64encode(file_content),
+            'res_model': self._name,
+            'res_id': job.id,
+        })
+        self.env.ref('library_management.ir_cron_process_catalogue_jobs')._trigger()
+        return job
+
+    @api.model
+    def _cron_process_jobs(self, limit=2):
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        # Jobs whose worker died are put back in the queue, they resume after their last chunk
+        stale = self.search([('state', '=', 'running'), ('write_date', '<', fields.Datetime.now() - timedelta(hours=1))])
+        stale.write({'state': 'queued'})
+
+        for job in self.search([('state', '=', 'queued')], order='id', limit=limit):
+            job._run(auto_commit)
+
+    def _get_report(self):
+        self.ensure_one()
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'authors_created': self.authors_created,
+            'errors': [],
+        }
+
+    def _run(self, auto_commit=True):
+        """Load the file in chunks, each chunk commits with the job counters."""
+        self.ensure_one()
+
+        def commit():
+            if auto_commit:
+                self.env.cr.commit()
+
+        self.write({'state': 'running', 'error': False})
+        commit()
+
+        def on_chunk(report, last_row):
+            errors, report['errors'] = report['errors'], []
+            vals = {name: report[name] for name in ('rows', 'created', 'updated', 'unchanged', 'authors_created')}
+            vals.update(last_row=last_row, error_count=self.error_count + len(errors))
+            if errors and self.error_count < ERROR_LOG_LIMIT:
+                lines = [f"Row {number}: {message}" for number, message in errors[:ERROR_LOG_LIMIT - self.error_count]]
+                vals['error_log'] = "\n".join(filter(None, [self.error_log] + lines))
+            self.write(vals)
+            commit()
+
+        try:
+            # Chunks commit on their own, without commits a savepoint keeps the transaction usable on failure
+            with contextlib.nullcontext() if auto_commit else self.env.cr.savepoint():
+                self.env['library.catalogue.import']._load(
+                    self.attachment_id.raw, self.name, start_row=self.last_row or 1,
+                    report=self._get_report(), on_chunk=on_chunk)
+            self.write({'state': 'done'})
+        except Exception as e:
+            if auto_commit:
+                self.env.cr.rollback()
+            _logger.exception("Catalogue import job %s failed", self.id)
+            self.write({'state': 'failed', 'error': str(e)})
+        commit()
+
+    def action_refresh(self):
+        # Reopen the form to show the current counters
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
@@ -2,16 +2,28 @@ from odoo import models, fields, api
 from datetime import datetime
 import re
 
+
+def normalize_author_name(name):
+    # Case and whitespace insensitive key used to deduplicate authors
+    return ' '.join((name or '').casefold().split())
+
+
 class Author(models.Model):
     _name = 'library.author'
     _description = 'Author write book in this library'
 
-    name = fields.Char(string="Author Name")
+    name = fields.Char(string="Author Name", index='trigram')
+    name_normalized = fields.Char(string="Normalized Name", compute="_compute_name_normalized", store=True, index=True)
     age = fields.Integer(string="Age")
     email = fields.Char(string="Email")
     dob = fields.Date(string="Date of Birth")
     pob = fields.Text(string="Place of Birth")
 
+    @api.depends('name')
+    def _compute_name_normalized(self):
+        for author in self:
+            author.name_normalized = normalize_author_name(author.name)
+
     @api.onchange('email')
     def onchange_email(self):
         if self.email:
@@ -1,21 +1,45 @@
-from markupsafe import Markup
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
 import re
 
+
+def normalize_isbn(value):
+    """Return the plain 13-digit ISBN of ``value``, or False when it is not a valid ISBN.
+
+    ISBN-10 values are converted to their 978 ISBN-13 form.
+    """
+    digits = re.sub(r'[^0-9X]', '', str(value or '').upper())
+    if len(digits) == 10:
+        if not digits[:9].isdigit():
+            return False
+        if sum((10 - i) * (10 if digit == 'X' else int(digit)) for i, digit in enumerate(digits)) % 11:
+            return False
+        body = '978' + digits[:9]
+    elif len(digits) == 13 and digits.isdigit():
+        body = digits[:12]
+    else:
+        return False
+    check = (10 - sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body)) % 10) % 10
+    isbn = body + str(check)
+    return isbn if len(digits) == 10 or isbn == digits else False
+
+
 class LibraryManagement(models.Model):
     _name = 'library.book'
     _description = 'Book in the library'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'library.image.mixin']
     _rec_name = 'title'
+    _rec_names_search = ['title', 'isbn', 'author_id.name']
 
-    title = fields.Char(string="Title", required=True)
+    title = fields.Char(string="Title", required=True, index='trigram')
     isbn = fields.Char(string="ISBN", size=17, help="13-Digits ISBN number")
     publication_date = fields.Date(string="Publication Date")
     author_id = fields.Many2one('library.author', string="Author")
-    image_1920 = fields.Binary(string="Cover image")
+    image_1920 = fields.Image(string="Cover image", max_width=1920, max_height=1920)
     book_age = fields.Integer(string="Book Age (Years)", compute="_compute_book_age", store=True)
-    member_id = fields.Many2one('library.member',tracking=True, string="Borrowing by")
+    member_id = fields.Many2one('library.member', string="Borrowing by")
 
 
     rental_fee = fields.Monetary(string="Rental Fee", default=1.0)
@@ -30,13 +54,27 @@ class LibraryManagement(models.Model):
 
 
 
-    total_rental = fields.Float(string="Total Rental", compute="_compute_total_rental", store=True)
+    copy_ids = fields.One2many('library.book.copy', 'book_id', string="Copies")
+    hold_ids = fields.One2many('library.book.hold', 'book_id', string="Holds")
+    # Status and borrower follow the copies, the counter fold cron refreshes them and
+    # the circulation events hold every change
+    event_ids = fields.One2many('library.circulation.event', 'book_id', string="History")
+    # The copies append deltas to library.book.counter, a cron folds them in here. Lists,
+    # filters and sorting read these stored counters, checkouts read the exact counts below.
+    folded_copies_total = fields.Integer(string="Copies", readonly=True, copy=False, default=0,
+                                         help="Updated every few minutes from the copy changes.")
+    folded_copies_available = fields.Integer(string="Available Copies", readonly=True, copy=False, default=0,
+                                             help="Updated every few minutes from the copy changes.")
+    copies_total = fields.Integer(string="Copies Now", compute='_compute_copies')
+    copies_available = fields.Integer(string="Available Now", compute='_compute_copies', search='_search_copies_available')
+    fee_line_ids = fields.One2many('library.rental.fee', 'book_id', string="Rental Fees")
+    # Read from the fee ledger when shown, a stored total would rewrite the title row on every checkout
+    total_rental = fields.Float(string="Total Rental", compute="_compute_total_rental")
     status = fields.Selection([
         ('available', 'Available'),
         ('borrowed', 'Borrowed'),
         ('lost', 'Lost')
     ], string="Status", default='available',
-        tracking=True,
         required=True, group_expand="_read_group_stage_ids")
     genre = fields.Selection([
         ('fiction', 'Fiction'),
@@ -46,24 +84,46 @@ class LibraryManagement(models.Model):
         ('science', 'Science'),
     ], string="Genre")
 
-    @api.depends('member_id', 'message_ids')
+    _sql_constraints = [
+        ('isbn_unique', 'unique(isbn)', "Another book already has this ISBN."),
+        ('copies_available_range',
+         'CHECK(folded_copies_available >= 0 AND folded_copies_available <= folded_copies_total)',
+         "A book cannot lend more copies than it has."),
+    ]
+
+    def init(self):
+        # The book picker only lists available books, ordered by title
+        create_index(self.env.cr, 'library_book_available_title_index', self._table, ['title', 'id'],
+                     where="status = 'available'")
+
+    @api.depends('folded_copies_total', 'folded_copies_available')
+    def _compute_copies(self):
+        pending = self.env['library.book.counter']._get_pending(self._origin.ids)
+        for book in self:
+            total, available = pending.get(book._origin.id, (0, 0))
+            book.copies_total = book.folded_copies_total + total
+            book.copies_available = book.folded_copies_available + available
+
+    def _search_copies_available(self, operator, value):
+        # Folded counter plus the pending deltas, one grouped subquery whatever the number of books
+        if operator not in ('=', '!=', '<', '<=', '>', '>=') or not isinstance(value, int):
+            raise UserError(f"Available copies cannot be searched with {operator} {value!r}.")
+        self.flush_model(['folded_copies_available'])
+        return [('id', 'in', SQL("""
+            SELECT b.id
+              FROM library_book b
+         LEFT JOIN (SELECT book_id, SUM(available) AS available FROM library_book_counter GROUP BY book_id) p
+                ON p.book_id = b.id
+             WHERE b.folded_copies_available + COALESCE(p.available, 0) %s %s
+        """, SQL(operator), value))]
+
+    @api.depends('fee_line_ids.amount')
     def _compute_total_rental(self):
-        pattern = re.compile(r'Rental fee:\s*\$?([0-9,.]+)')
+        # One grouped query over the fee ledger instead of scanning the chatter
+        totals = dict(self.env['library.rental.fee']._read_group(
+            [('book_id', 'in', self._origin.ids)], ['book_id'], ['amount:sum']))
         for book in self:
-            total = 0.0
-            for msg in book.message_ids:
-                if msg.body:
-                    # Search for "Rental fee: $xxx.xx" pattern
-                    match = pattern.search(msg.body)
-                    if match:
-                        # Remove commas and convert to float
-                        amount_str = match.group(1).replace(',', '')
-                        try:
-                            amount = float(amount_str)
-                            total += amount
-                        except ValueError:
-                            pass
-            book.total_rental = total
+            book.total_rental = totals.get(book._origin, 0.0)
 
     @api.depends('rental_fee')
     def _compute_currency(self):
@@ -83,80 +143,224 @@ class LibraryManagement(models.Model):
     def _read_group_stage_ids(self, stages, domain):
         return [key for key, _ in self._fields['status'].selection]
 
+    @api.model
+    def name_search(self, name='', domain=None, operator='ilike', limit=100):
+        # Typeahead is ranked and typo tolerant, other operators keep the default search
+        if name and operator == 'ilike':
+            books = self.env['library.search']._search_books(name, domain=domain, limit=limit)[0]
+            return [(book.id, book.display_name) for book in books]
+        return super().name_search(name, domain, operator, limit)
+
     @api.onchange('isbn')
     def _onchange_isbn(self):
         if self.isbn:
-            # Remove all non-digit characters
-            digits = re.sub(r'\D', '', self.isbn)
+            digits = normalize_isbn(self.isbn)
 
-            if len(digits) == 13:
+            if digits:
                 # Format as 978-3-16-148410-0
                 self.isbn = f"{digits[0:3]}-{digits[3]}-{digits[4:6]}-{digits[6:12]}-{digits[12]}"
             else:
-                self.isbn=digits
+                self.isbn = re.sub(r'\D', '', self.isbn)
                 return {
                     'warning': {
                         'title': "Invalid ISBN",
-                        'message': "ISBN must contain exactly 13 digits.",
+                        'message': "ISBN must contain exactly 13 digits with a valid check digit.",
                     }
                 }
 
-
     @api.model
-    def create(self, vals):
-        if 'isbn' in vals and vals['isbn']:
-            digits = re.sub(r'\D', '', vals['isbn'])  # Remove all non-digit characters
-            if len(digits) == 13:
-                vals['isbn'] = digits  # Store plain 13-digit value
+    def _normalize_isbn_vals(self, vals):
+        # Books are keyed by the plain 13-digit ISBN, invalid values are not stored
+        if vals.get('isbn'):
+            isbn = normalize_isbn(vals['isbn'])
+            if isbn:
+                vals['isbn'] = isbn
             else:
                 del vals['isbn']
-        for record in self:
-            if 'member_id' in vals:
-                member_id = vals['member_id']
-                member = self.env['library.member'].browse(member_id)
-                record.message_post(
-                    body=Markup(
-                        f"<h3>This 📘 Book borrowed by: {new_member.name} <br/>Rental fee: {record.currency_id.symbol}{record.rental_fee}</h3>")
-                )
+        return vals
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            self._normalize_isbn_vals(vals)
+        self.env['library.dashboard.snapshot']._invalidate()
+        books = super(LibraryManagement, self).create(vals_list)
 
-        return super(LibraryManagement, self).create(vals)
+        # A new title comes with one copy unless its copies were given
+        self.env['library.book.copy'].create([
+            {'book_id': book.id, 'status': book.status, 'member_id': book.member_id.id}
+            for book, vals in zip(books, vals_list) if not vals.get('copy_ids')
+        ])
+        return books
 
     @api.model
+    def _resolve_codes(self, codes):
+        """Map every scanned code to ``(book, copy)`` with one query per kind of code.
+
+        Copy barcodes resolve to their copy, ISBNs to the title with an empty
+        copy. Unknown codes map to two empty recordsets.
+        """
+        Copy = self.env['library.book.copy']
+        isbns = {code: normalize_isbn(code) for code in codes}
+        books = {book.isbn: book for book in self.search([('isbn', 'in', [isbn for isbn in isbns.values() if isbn])])}
+        barcodes = [code.strip() for code, isbn in isbns.items() if not isbn]
+        copies = {copy.barcode: copy for copy in Copy.search([('barcode', 'in', barcodes)])} if barcodes else {}
+        resolved = {}
+        for code, isbn in isbns.items():
+            copy = copies.get(code.strip(), Copy) if not isbn else Copy
+            resolved[code] = (copy.book_id if copy else books.get(isbn, self.browse()), copy)
+        return resolved
+
+    def _take_copies(self, member, rental=None, preferred=None):
+        """Lend ``member`` one available copy of every book in self.
+
+        Copies are picked in the database with ``FOR UPDATE SKIP LOCKED``, so
+        two desks never lend the same copy and never wait on each other; the
+        title row is not locked.
+        ``preferred`` copies (scanned at the desk) are used first for their
+        book, then the copies kept for the member's holds. Raises when a book
+        has no copy left.
+        """
+        Copy = self.env['library.book.copy']
+        if not self:
+            return Copy
+        Copy.flush_model(['book_id', 'status'])
+        cr = self.env.cr
+        # The scanned copy is the one handed over, it comes first. A copy kept for
+        # the member's hold comes next and is freed by _fulfil when not taken.
+        held = self.env['library.book.hold'].search([
+            ('member_id', '=', member.id), ('book_id', 'in', self.ids), ('state', '=', 'ready'),
+        ]).copy_id
+        scanned = (preferred or Copy).filtered(lambda copy: copy.book_id in self)
+        preferred = scanned | held
+        picked = {}
+        if preferred:
+            cr.execute("""
+                SELECT id, book_id
+                  FROM library_book_copy
+                 WHERE id = ANY(%s) AND (status = 'available' OR (status = 'held' AND id = ANY(%s)))
+              ORDER BY id = ANY(%s) DESC, status = 'held' DESC, id
+                   FOR UPDATE SKIP LOCKED
+            """, (preferred.ids, held.ids, scanned.ids))
+            for copy_id, book_id in cr.fetchall():
+                picked.setdefault(book_id, copy_id)
+        remaining = sorted(set(self.ids) - set(picked))
+        if remaining:
+            # The lowest free copy of each title, one index probe per title
+            cr.execute("""
+                SELECT c.id, c.book_id
+                  FROM unnest(%s::int[]) AS b(id)
+            CROSS JOIN LATERAL (
+                       SELECT id, book_id
+                         FROM library_book_copy
+                        WHERE book_id = b.id AND status = 'available'
+                     ORDER BY id
+                        LIMIT 1
+                          FOR UPDATE SKIP LOCKED
+                   ) c
+            """, (remaining,))
+            picked.update({book_id: copy_id for copy_id, book_id in cr.fetchall()})
+        for book in self:
+            if book.id not in picked:
+                raise UserError(f"No copy of '{book.title}' is available.")
+        taken = Copy.browse([picked[book.id] for book in self])
+        taken.invalidate_recordset(['status'])
+        taken.write({'status': 'borrowed', 'member_id': member.id, 'rental_id': rental.id if rental else False})
+        self.env['library.book.hold']._fulfil(member, taken)
+        return taken
+
+    def _get_unavailable(self, member):
+        # Books with no copy on the shelf and none kept for the member
+        held = self.env['library.book.hold'].search([
+            ('member_id', '=', member.id), ('book_id', 'in', self.ids), ('state', '=', 'ready'),
+        ]).book_id
+        return self.filtered(lambda book: book.copies_available < 1) - held
+
+    def _release_copies(self, member):
+        # Copies of these books lent to the member outside of a rental go back on the shelf
+        copies = self.env['library.book.copy'].search([
+            ('book_id', 'in', self.ids), ('member_id', '=', member.id),
+            ('rental_id', '=', False), ('status', '=', 'borrowed'),
+        ])
+        copies.write({'status': 'available', 'member_id': False})
+        return copies
+
+    def _sync_copies_from_status(self, status):
+        # A title marked lost or found by hand takes its shelf copies along
+        Copy = self.env['library.book.copy']
+        if status == 'lost':
+            Copy.search([('book_id', 'in', self.ids), ('status', '=', 'available')]).write({'status': 'lost'})
+        elif status == 'available':
+            Copy.search([('book_id', 'in', self.ids), ('status', '=', 'lost')]).write({'status': 'available'})
+
+    def _get_open_rentals(self):
+        # Non-returned rentals of every book in self, loaded with one search
+        Rental = self.env['library.rental']
+        rentals = Rental.search([('book_ids', 'in', self.ids), ('state', '!=', 'returned')], order='id')
+        open_rentals = {book_id: Rental for book_id in self.ids}
+        for rental in rentals:
+            for book_id in rental.book_ids.ids:
+                if book_id in open_rentals:
+                    open_rentals[book_id] |= rental
+        return open_rentals
+
+    def _check_status_transition(self, status, open_rentals):
+        # Validate the status change of every book in memory
+        for book in self:
+            rentals = open_rentals[book.id]
+            if {status, book.status} == {'available', 'borrowed'}:
+                raise UserError("Invalid status change: Cannot switch directly between 'borrowed' and 'available'.")
+            if book.status == 'lost' and status == 'borrowed' and not rentals:
+                raise UserError(f"Cannot mark '{book.title}' as 'borrowed': This book has not been rented.")
+            if book.status == 'lost' and status == 'available' and rentals.filtered(lambda r: r.state != 'draft'):
+                raise UserError(f"Cannot mark '{book.title}' as 'available': The book is currently rented and lost.")
+
     def write(self, vals):
-        for record in self:
-            if 'status' in vals and not self.env.context.get('from_member_form'):
-                if (vals['status'] == 'available' and record.status == 'borrowed') \
-                        or (vals['status'] == 'borrowed' and record.status == 'available'):
-                    vals.pop('status')
-                    raise UserError("Invalid status change: Cannot switch directly between 'borrowed' and 'available'.")
-
-                elif vals['status'] == 'borrowed' and record.status == 'lost':
-                    rental = self.env['library.rental'].search([
-                        ('book_ids', 'in', record.id),
-                        ('state', '!=', 'returned')
-                    ])
-                    if not rental:
-                        vals.pop('status')
-                        raise UserError("Cannot mark as 'borrowed': This book has not been rented.")
-
-                elif vals['status'] == 'available' and record.status == 'lost':
-                    rental = self.env['library.rental'].search([
-                        ('book_ids', 'in', record.id),
-                        ('state', 'not in', ['returned', 'draft'])
-                    ])
-                    if rental:
-                        vals.pop('status')
-                        raise UserError("Cannot mark as 'available': The book is currently rented and lost.")
-
-        for rec in self:
-            if 'status' in vals and vals['status'] in ['borrowed', 'lost']:
-                rental = self.env['library.rental'].search([
-                    ('state', 'not in', ['returned', 'draft']),
-                    ('book_ids', '=', rec.id)
-                ], limit=1)
-                vals['member_id'] = rental.member_id if rental else False
+        if 'isbn' in vals:
+            vals = self._normalize_isbn_vals(dict(vals))
+        if 'status' in vals or 'genre' in vals:
+            self.env['library.dashboard.snapshot']._invalidate()
+        # Genre is part of the rental rollup grain
+        Rollup = self.env['library.rental.rollup']
+        rentals = self.env['library.rental'].search([('book_ids', 'in', self.ids)]) if 'genre' in vals and self else None
+        before = Rollup._get_contributions(rentals.ids) if rentals else None
+        if 'status' in vals and self:
+            res = self._write_status(vals)
+            if not self.env.context.get('from_member_form'):
+                self._sync_copies_from_status(vals['status'])
+        else:
+            res = super().write(vals)
+        if before is not None:
+            Rollup._apply(before, Rollup._get_contributions(rentals.ids))
+        return res
+
+    def _write_status(self, vals):
+        status = vals['status']
+        open_rentals = self._get_open_rentals()
+        if not self.env.context.get('from_member_form'):
+            self._check_status_transition(status, open_rentals)
+
+        # Resolve the borrower in memory and write once per target member
+        books_by_member = {}
+        for book in self:
+            if 'member_id' in vals:
+                member_id = vals['member_id']
+            elif status == 'available':
+                member_id = False
             else:
-                vals['member_id'] = False
+                rental = open_rentals[book.id].filtered(lambda r: r.state != 'draft')[:1]
+                member_id = rental.member_id.id if rental else book.member_id.id
+            books_by_member.setdefault(member_id, []).append(book.id)
+
+        for member_id, book_ids in books_by_member.items():
+            super(LibraryManagement, self.browse(book_ids)).write(dict(vals, member_id=member_id))
+        return True
 
-        res = super().write(vals)
+    def unlink(self):
+        Rollup = self.env['library.rental.rollup']
+        rentals = self.env['library.rental'].search([('book_ids', 'in', self.ids)])
+        before = Rollup._get_contributions(rentals.ids)
+        self.env['library.dashboard.snapshot']._invalidate()
+        res = super().unlink()
+        Rollup._apply(before, Rollup._get_contributions(rentals.exists().ids))
         return res
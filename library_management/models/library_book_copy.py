@@ -0,0 +1,110 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import index_exists
+
+
+class LibraryBookCopy(models.Model):
+    _name = 'library.book.copy'
+    _description = 'Physical copy of a book'
+    _rec_name = 'barcode'
+    _order = 'book_id, barcode'
+
+    book_id = fields.Many2one('library.book', string="Book", required=True, index=True, ondelete='cascade')
+    barcode = fields.Char(string="Barcode", copy=False, help="Left empty, a C-number is assigned on save.")
+    status = fields.Selection([
+        ('available', 'Available'),
+        ('held', 'Held'),
+        ('borrowed', 'Borrowed'),
+        ('lost', 'Lost'),
+    ], string="Status", default='available', required=True, index=True)
+    member_id = fields.Many2one('library.member', string="Borrowed by", index=True, readonly=True)
+    rental_id = fields.Many2one('library.rental', string="Rental", index=True, readonly=True, ondelete='set null')
+
+    _sql_constraints = [
+        ('barcode_unique', 'unique(barcode)', "The copy barcode must be unique."),
+    ]
+
+    def init(self):
+        # A rental holds at most one copy of each title
+        if not index_exists(self.env.cr, 'library_book_copy_rental_book_unique'):
+            self.env.cr.execute(SQL(
+                "CREATE UNIQUE INDEX %s ON %s (rental_id, book_id) WHERE rental_id IS NOT NULL",
+                SQL.identifier('library_book_copy_rental_book_unique'), SQL.identifier(self._table),
+            ))
+
+    @api.model
+    def _allocate_barcodes(self, count):
+        """Reserve ``count`` copy barcodes of the form C00000001 in one round trip."""
+        if not count:
+            return []
+
+        def last_used_number():
+            self.flush_model(['barcode'])
+            self.env.cr.execute(r"SELECT MAX(SUBSTRING(barcode FROM 2)::int) FROM library_book_copy WHERE barcode ~ '^C\d+$'")
+            return self.env.cr.fetchone()[0] or 0
+
+        first = self.env['library.sequence'].sudo()._reserve('library.book.copy', count, last_used_number)
+        return [f"C{number:08d}" for number in range(first, first + count)]
+
+    def _get_counter_deltas(self, sign=1):
+        # What each copy adds to the (total, available) counters of its book, lost copies count for nothing
+        deltas = {}
+        for copy in self:
+            total, available = deltas.get(copy.book_id.id, (0, 0))
+            deltas[copy.book_id.id] = (
+                total + sign * (copy.status != 'lost'),
+                available + sign * (copy.status == 'available'),
+            )
+        return deltas
+
+    @api.model
+    def _apply_counter_deltas(self, *deltas_list):
+        """Record the summed deltas of the book counters.
+
+        They are appended to library.book.counter instead of updating the book
+        rows, so concurrent checkouts of a title never conflict on its row. The
+        title status and borrower follow when the deltas are folded.
+        """
+        deltas = {}
+        for book_deltas in deltas_list:
+            for book_id, (total, available) in book_deltas.items():
+                old_total, old_available = deltas.get(book_id, (0, 0))
+                deltas[book_id] = (old_total + total, old_available + available)
+        deltas = {book_id: delta for book_id, delta in deltas.items() if delta != (0, 0)}
+        if not deltas:
+            return
+        self.env['library.book.counter']._add(deltas)
+        self.env['library.book'].browse(sorted(deltas)).invalidate_recordset(['copies_total', 'copies_available'])
+        self.env['library.dashboard.snapshot']._invalidate()
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        to_number = [vals for vals in vals_list if not vals.get('barcode')]
+        for vals, barcode in zip(to_number, self._allocate_barcodes(len(to_number))):
+            vals['barcode'] = barcode
+        copies = super().create(vals_list)
+        self.env['library.circulation.event']._log_states(copies)
+        self._apply_counter_deltas(copies._get_counter_deltas())
+        self.env['library.book.hold']._allocate(copies)
+        return copies
+
+    def write(self, vals):
+        if 'status' not in vals and 'book_id' not in vals:
+            return super().write(vals)
+        Event = self.env['library.circulation.event']
+        snapshot = Event._snapshot(self) if 'status' in vals else None
+        before = self._get_counter_deltas(sign=-1)
+        res = super().write(vals)
+        if snapshot is not None:
+            Event._log_states(self, snapshot)
+        self._apply_counter_deltas(before, self._get_counter_deltas())
+        if vals.get('status') == 'available':
+            # Copies back on the shelf go to the next hold of their title
+            self.env['library.book.hold']._allocate(self)
+        return res
+
+    def unlink(self):
+        before = self._get_counter_deltas(sign=-1)
+        res = super().unlink()
+        self._apply_counter_deltas(before)
+        return res
@@ -0,0 +1,92 @@
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class LibraryBookCounter(models.Model):
+    _name = 'library.book.counter'
+    _description = 'Pending change of the copy counters of a book'
+    # Insert-only rows, folded into the books by a cron
+    _log_access = False
+
+    book_id = fields.Many2one('library.book', string="Book", required=True, index=True, ondelete='cascade')
+    total = fields.Integer(string="Copies")
+    available = fields.Integer(string="Available Copies")
+
+    @api.model
+    def _add(self, deltas):
+        """Record the ``{book_id: (total, available)}`` deltas with one INSERT.
+
+        Only new rows are written, so concurrent checkouts and returns of the
+        same title never wait on each other or on the book row.
+        """
+        rows = [(book_id, total, available) for book_id, (total, available) in deltas.items() if (total, available) != (0, 0)]
+        if not rows:
+            return
+        book_ids, totals, availables = zip(*rows)
+        self.env.cr.execute("""
+            INSERT INTO library_book_counter (book_id, total, available)
+                 SELECT * FROM unnest(%s::int[], %s::int[], %s::int[])
+        """, (list(book_ids), list(totals), list(availables)))
+
+    @api.model
+    def _get_pending(self, book_ids):
+        # Deltas not folded yet, one grouped query on the book index
+        if not book_ids:
+            return {}
+        self.env.cr.execute("""
+            SELECT book_id, SUM(total), SUM(available)
+              FROM library_book_counter
+             WHERE book_id = ANY(%s)
+          GROUP BY book_id
+        """, (list(book_ids),))
+        return {book_id: (total, available) for book_id, total, available in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_totals(self):
+        # Copies and available copies over the whole catalogue
+        self.env.cr.execute("""
+            SELECT COALESCE(SUM(folded_copies_total), 0) + (SELECT COALESCE(SUM(total), 0) FROM library_book_counter),
+                   COALESCE(SUM(folded_copies_available), 0) + (SELECT COALESCE(SUM(available), 0) FROM library_book_counter)
+              FROM library_book
+        """)
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _cron_fold(self, limit=50000):
+        """Move pending deltas into the book counters, oldest first.
+
+        Rows taken by another worker are skipped. The moved deltas are deleted
+        and added in the same statement, so readers never count them twice.
+        The title status and borrower, derived from the copies, are refreshed
+        here instead of on every checkout: available while a copy is on the
+        shelf, lost once every copy is, borrowed otherwise.
+        """
+        self.env['library.book.copy'].flush_model(['book_id', 'status', 'member_id'])
+        self.env.cr.execute("""
+            WITH moved AS (
+                DELETE FROM library_book_counter
+                 WHERE id IN (SELECT id FROM library_book_counter ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)
+             RETURNING book_id, total, available
+            ),
+            folded AS (
+                SELECT book_id, SUM(total) AS total, SUM(available) AS available FROM moved GROUP BY book_id
+            )
+            UPDATE library_book b
+               SET folded_copies_total = b.folded_copies_total + m.total,
+                   folded_copies_available = b.folded_copies_available + m.available,
+                   status = CASE WHEN b.folded_copies_available + m.available > 0 THEN 'available'
+                                 WHEN b.folded_copies_total + m.total > 0 THEN 'borrowed'
+                                 ELSE 'lost' END,
+                   member_id = CASE WHEN b.folded_copies_available + m.available > 0 THEN NULL
+                                    ELSE (SELECT c.member_id FROM library_book_copy c
+                                           WHERE c.book_id = b.id AND c.status = 'borrowed'
+                                        ORDER BY c.id DESC LIMIT 1) END
+              FROM folded m
+             WHERE b.id = m.book_id
+        """, (limit,))
+        folded = self.env.cr.rowcount
+        self.env['library.book'].invalidate_model(['folded_copies_total', 'folded_copies_available', 'status', 'member_id'])
+        _logger.info("Folded pending copy counters of %s book(s).", folded)
+        return folded
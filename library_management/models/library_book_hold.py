@@ -0,0 +1,175 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.sql import create_index, index_exists
+from datetime import timedelta
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+# Lower is served first, other membership types share the last rank
+HOLD_PRIORITY = {'vip': 0, 'teacher': 1}
+DEFAULT_HOLD_PRIORITY = 2
+# Days a member has to pick up a copy kept for them
+HOLD_PICKUP_DAYS = 3
+
+
+class LibraryBookHold(models.Model):
+    _name = 'library.book.hold'
+    _description = 'Hold placed by a member on a book'
+    _order = 'book_id, priority, request_date, id'
+
+    book_id = fields.Many2one('library.book', string="Book", required=True, index=True, ondelete='cascade')
+    member_id = fields.Many2one('library.member', string="Member", required=True, index=True, ondelete='cascade')
+    priority = fields.Integer(string="Priority", readonly=True, help="Holds with a lower priority are served first.")
+    request_date = fields.Datetime(string="Requested On", required=True, readonly=True, default=fields.Datetime.now)
+    state = fields.Selection([
+        ('waiting', 'Waiting'),
+        ('ready', 'Ready for Pickup'),
+        ('done', 'Picked Up'),
+        ('expired', 'Expired'),
+        ('cancelled', 'Cancelled'),
+    ], string="Status", default='waiting', required=True, index=True)
+    copy_id = fields.Many2one('library.book.copy', string="Kept Copy", readonly=True, ondelete='set null')
+    expiry_date = fields.Date(string="Pickup Before", readonly=True, index=True)
+    mail_id = fields.Many2one('mail.mail', string="Mail", readonly=True, ondelete='set null')
+
+    def init(self):
+        # The queue of a title is read in serving order from the head, without scanning it
+        create_index(self.env.cr, 'library_book_hold_queue_index', self._table,
+                     ['book_id', 'priority', 'request_date', 'id'], where="state = 'waiting'")
+        # A member queues once per title
+        if not index_exists(self.env.cr, 'library_book_hold_open_unique'):
+            self.env.cr.execute(SQL(
+                "CREATE UNIQUE INDEX %s ON %s (member_id, book_id) WHERE state IN ('waiting', 'ready')",
+                SQL.identifier('library_book_hold_open_unique'), SQL.identifier(self._table),
+            ))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        members = self.env['library.member'].browse([vals['member_id'] for vals in vals_list if vals.get('member_id')])
+        types = {member.id: member.membership_type for member in members}
+        for vals in vals_list:
+            if 'priority' not in vals:
+                vals['priority'] = HOLD_PRIORITY.get(types.get(vals.get('member_id')), DEFAULT_HOLD_PRIORITY)
+        holds = super().create(vals_list)
+        self.env['library.circulation.event']._log_states(holds)
+        # Copies on the shelf go to the new holds right away
+        copies = self.env['library.book.copy'].search([('book_id', 'in', holds.book_id.ids), ('status', '=', 'available')])
+        self._allocate(copies)
+        return holds
+
+    def write(self, vals):
+        Event = self.env['library.circulation.event']
+        before = Event._snapshot(self) if 'state' in vals else None
+        res = super().write(vals)
+        if before is not None:
+            Event._log_states(self, before)
+        return res
+
+    @api.model
+    def _allocate(self, copies):
+        """Keep every available copy in ``copies`` for the head of its title's queue.
+
+        The heads are read from the queue index, one probe per title, so long
+        queues cost no more than short ones. Mails are only queued, the mail
+        queue cron sends them.
+        """
+        copies = copies.filtered(lambda copy: copy.status == 'available')
+        if not copies:
+            return self.browse()
+        copies_by_book = {}
+        for copy in copies.sorted('id'):
+            copies_by_book.setdefault(copy.book_id.id, []).append(copy.id)
+        book_ids = sorted(copies_by_book)
+        self.flush_model(['book_id', 'state', 'priority', 'request_date'])
+        self.env.cr.execute("""
+            SELECT h.id, h.book_id
+              FROM unnest(%s::int[], %s::int[]) AS b(id, n)
+        CROSS JOIN LATERAL (
+                   SELECT id, book_id
+                     FROM library_book_hold
+                    WHERE book_id = b.id AND state = 'waiting'
+                 ORDER BY priority, request_date, id
+                    LIMIT b.n
+                      FOR UPDATE SKIP LOCKED
+               ) h
+        """, (book_ids, [len(copies_by_book[book_id]) for book_id in book_ids]))
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return self.browse()
+
+        expiry_date = fields.Date.today() + timedelta(days=HOLD_PICKUP_DAYS)
+        Copy = self.env['library.book.copy']
+        holds = self.browse()
+        kept = Copy
+        for hold_id, book_id in rows:
+            hold = self.browse(hold_id)
+            copy = Copy.browse(copies_by_book[book_id].pop(0))
+            hold.copy_id = copy
+            holds |= hold
+            kept |= copy
+        # One state write, so the queue moves are logged together
+        holds.write({'state': 'ready', 'expiry_date': expiry_date})
+        kept.write({'status': 'held'})
+        holds._notify_ready()
+        return holds
+
+    def _notify_ready(self):
+        template = self.env.ref('library_management.email_template_hold_ready', raise_if_not_found=False)
+        if not template:
+            _logger.warning("Email template NOT found: library_management.email_template_hold_ready")
+            return
+        mails = template.send_mail_batch(self.ids, force_send=False)
+        if len(mails) == len(self):
+            for hold, mail in zip(self, mails):
+                hold.mail_id = mail
+
+    def _release(self, state):
+        # The kept copies go back on the shelf and on to the next holds in line
+        copies = self.copy_id.filtered(lambda copy: copy.status == 'held')
+        self.write({'state': state, 'copy_id': False})
+        copies.write({'status': 'available'})
+
+    @api.model
+    def _fulfil(self, member, copies):
+        # Open holds of the member on the titles just lent are done, copies kept for them are freed
+        holds = self.search([
+            ('member_id', '=', member.id), ('book_id', 'in', copies.book_id.ids), ('state', 'in', ('waiting', 'ready')),
+        ])
+        freed = holds.copy_id.filtered(lambda copy: copy.status == 'held') - copies
+        holds.write({'state': 'done', 'copy_id': False})
+        freed.write({'status': 'available'})
+
+    def action_cancel(self):
+        for hold in self:
+            if hold.state not in ('waiting', 'ready'):
+                raise UserError("Only waiting or ready holds can be cancelled.")
+        self._release('cancelled')
+
+    @api.model
+    def _cron_expire_holds(self, batch_size=500, limit=5000):
+        """Expire the holds that were not picked up in time, in committed chunks.
+
+        Every expired copy is offered to the next hold of its title. The cron
+        is re-triggered when more holds than ``limit`` are waiting.
+        """
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        today = fields.Date.today()
+        done = 0
+        while done < limit:
+            holds = self.search([('state', '=', 'ready'), ('expiry_date', '<', today)], order='id', limit=batch_size)
+            if not holds:
+                break
+            holds._release('expired')
+            done += len(holds)
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+        else:
+            cron = self.env.ref('library_management.ir_cron_expire_book_holds', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        _logger.info("Expired %s book hold(s).", done)
+        return done
@@ -0,0 +1,90 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools.sql import create_index
+
+# Source model of the events and the field holding its state
+EVENT_SOURCES = {
+    'library.rental': ('rental', 'state', 'rental_id'),
+    'library.book.copy': ('copy', 'status', 'copy_id'),
+    'library.book.hold': ('hold', 'state', 'hold_id'),
+}
+LINK_FIELDS = ('rental_id', 'book_id', 'copy_id', 'hold_id', 'member_id')
+
+
+class LibraryCirculationEvent(models.Model):
+    _name = 'library.circulation.event'
+    _description = 'Circulation event'
+    _order = 'id desc'
+    # Rows are only ever inserted, the event date and user are the whole audit trail
+    _log_access = False
+
+    event_date = fields.Datetime(string="Date", required=True, readonly=True, default=fields.Datetime.now)
+    user_id = fields.Many2one('res.users', string="User", readonly=True, default=lambda self: self.env.uid, ondelete='set null')
+    event_type = fields.Selection([
+        ('rental', 'Rental'),
+        ('copy', 'Copy'),
+        ('hold', 'Hold'),
+    ], string="Type", required=True, readonly=True)
+    rental_id = fields.Many2one('library.rental', string="Rental", readonly=True, index=True, ondelete='set null')
+    book_id = fields.Many2one('library.book', string="Book", readonly=True, index=True, ondelete='set null')
+    copy_id = fields.Many2one('library.book.copy', string="Copy", readonly=True, index=True, ondelete='set null')
+    hold_id = fields.Many2one('library.book.hold', string="Hold", readonly=True, ondelete='set null')
+    member_id = fields.Many2one('library.member', string="Member", readonly=True, index=True, ondelete='set null')
+    old_state = fields.Selection(selection='_get_states', string="From", readonly=True)
+    new_state = fields.Selection(selection='_get_states', string="To", readonly=True)
+
+    def init(self):
+        # Events are appended in date order, a BRIN index covers date ranges at a fraction of a btree
+        create_index(self.env.cr, 'library_circulation_event_date_brin', self._table, ['event_date'], method='brin')
+
+    @api.model
+    def _get_states(self):
+        states = {}
+        for model_name, (__, state_field, __) in EVENT_SOURCES.items():
+            states.update(self.env[model_name]._fields[state_field]._description_selection(self.env))
+        return list(states.items())
+
+    @api.model
+    def _get_links(self, record):
+        links = {name: record[name].id for name in LINK_FIELDS if name in record._fields}
+        links[EVENT_SOURCES[record._name][2]] = record.id
+        return links
+
+    @api.model
+    def _snapshot(self, records):
+        """State and links of ``records`` before a write.
+
+        The links are kept for the event when the write clears them, a copy
+        given back loses its borrower and rental.
+        """
+        state_field = EVENT_SOURCES[records._name][1]
+        return {record.id: (record[state_field], self._get_links(record)) for record in records}
+
+    @api.model
+    def _log_states(self, records, before=None):
+        """Log the state of ``records`` with one insert.
+
+        ``before`` is the snapshot taken before the write, records whose state
+        did not change are skipped. Without it the records are new.
+        """
+        event_type, state_field, __ = EVENT_SOURCES[records._name]
+        vals_list = []
+        for record in records:
+            old_state, old_links = (before or {}).get(record.id, (False, {}))
+            if before is not None and old_state == record[state_field]:
+                continue
+            links = {name: value or old_links.get(name, False) for name, value in self._get_links(record).items()}
+            vals_list.append(dict(links, event_type=event_type, old_state=old_state, new_state=record[state_field]))
+        return self._log(vals_list)
+
+    @api.model
+    def _log(self, vals_list):
+        if not vals_list:
+            return self.browse()
+        return self.sudo().create(vals_list)
+
+    def write(self, vals):
+        raise UserError("Circulation events cannot be changed.")
+
+    def unlink(self):
+        raise UserError("Circulation events cannot be deleted.")
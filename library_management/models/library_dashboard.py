@@ -0,0 +1,103 @@
+from odoo import models, fields, api
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+import logging
+import psycopg2
+
+_logger = logging.getLogger(__name__)
+
+# Seconds a dashboard snapshot is served before it is rebuilt
+DASHBOARD_TTL = 60
+
+
+class LibraryDashboardSnapshot(models.Model):
+    _name = 'library.dashboard.snapshot'
+    _description = 'Cached statistics of the library dashboard'
+
+    company_id = fields.Many2one('res.company', string="Company", required=True, ondelete='cascade')
+    payload = fields.Json(string="Statistics")
+    computed_at = fields.Datetime(string="Computed At")
+    dirty = fields.Boolean(string="Outdated")
+
+    _sql_constraints = [
+        ('company_unique', 'unique(company_id)', "Only one dashboard snapshot per company."),
+    ]
+
+    @api.model
+    def _get_stats(self, ttl=DASHBOARD_TTL):
+        """Dashboard statistics of the current company, rebuilt when outdated or older than ``ttl``."""
+        Snapshot = self.sudo()
+        snapshot = Snapshot.search([('company_id', '=', self.env.company.id)], limit=1)
+        now = fields.Datetime.now()
+        if snapshot and not snapshot.dirty and snapshot.computed_at and snapshot.computed_at > now - timedelta(seconds=ttl):
+            return snapshot.payload
+
+        payload = self._compute_stats()
+        vals = {'payload': payload, 'computed_at': now, 'dirty': False}
+        try:
+            # Another worker may be refreshing the same row, serve our copy without storing it
+            with self.env.cr.savepoint():
+                if snapshot:
+                    self.env.cr.execute("SELECT id FROM library_dashboard_snapshot WHERE id = %s FOR UPDATE NOWAIT", (snapshot.id,))
+                    snapshot.write(vals)
+                else:
+                    Snapshot.create(dict(vals, company_id=self.env.company.id))
+        except (psycopg2.errors.LockNotAvailable, psycopg2.errors.SerializationFailure, psycopg2.errors.UniqueViolation):
+            _logger.debug("Dashboard snapshot refreshed concurrently, skipping store.")
+        return payload
+
+    @api.model
+    def _compute_stats(self):
+        # One GROUP BY query per breakdown
+        Book = self.env['library.book'].sudo()
+        Rental = self.env['library.rental'].sudo()
+
+        def breakdown(model, field_name, domain=()):
+            counts = dict(model._read_group(list(domain), [field_name], ['__count']))
+            return {label: counts.get(key, 0) for key, label in model._fields[field_name].selection}
+
+        # Copies on the shelf and out come from the title counters
+        copies_total, copies_available = self.env['library.book.counter'].sudo()._get_totals()
+        # Held and lost copies are few, they are counted on the copies
+        Copy = self.env['library.book.copy'].sudo()
+        others = dict(Copy._read_group([('status', 'in', ('held', 'lost'))], ['status'], ['__count']))
+        status_labels = dict(Copy._fields['status'].selection)
+        copy_status_count = {
+            status_labels['available']: copies_available or 0,
+            status_labels['held']: others.get('held', 0),
+            status_labels['borrowed']: (copies_total or 0) - (copies_available or 0) - others.get('held', 0),
+            status_labels['lost']: others.get('lost', 0),
+        }
+
+        today = fields.Date.context_today(self)
+        first_month = today.replace(day=1) - relativedelta(months=5)
+        per_month = dict(Rental._read_group([('rental_date', '>=', first_month)], ['rental_date:month'], ['__count']))
+        rental_per_mount = {}
+        for i in range(6):
+            month_start = today.replace(day=1) - relativedelta(months=i)
+            rental_per_mount[month_start.strftime('%B')] = per_month.get(month_start, 0)
+
+        return {
+            'book_status_count': copy_status_count,
+            'book_genre_count': breakdown(Book, 'genre'),
+            'rental_per_mount': rental_per_mount,
+            'rental_state_count': breakdown(Rental, 'state'),
+        }
+
+    @api.model
+    def _invalidate(self):
+        # Flag the snapshots once the current transaction is committed, in a
+        # separate cursor so circulation writes never wait on the cache row
+        data = self.env.cr.postcommit.data
+        if data.get('library.dashboard.invalidate'):
+            return
+        data['library.dashboard.invalidate'] = True
+        registry = self.env.registry
+
+        @self.env.cr.postcommit.add
+        def mark_dirty():
+            try:
+                with registry.cursor() as cr:
+                    cr.execute("UPDATE library_dashboard_snapshot SET dirty = TRUE WHERE NOT dirty")
+            except psycopg2.Error:
+                _logger.warning("Could not invalidate the library dashboard snapshot.", exc_info=True)
@@ -0,0 +1,14 @@
+from odoo import models
+import hashlib
+
+
+class LibraryImageMixin(models.AbstractModel):
+    _name = 'library.image.mixin'
+    _inherit = ['image.mixin']
+    _description = 'Library image with resized variants'
+
+    def _image_url(self, size=256):
+        """Cacheable URL of the ``image_<size>`` variant, it changes whenever the record is written."""
+        self.ensure_one()
+        unique = hashlib.sha1(str(self.write_date).encode()).hexdigest()[:8]
+        return f"/library/image/{self._name}/{self.id}/{size}?unique={unique}"
@@ -1,4 +1,3 @@
-from markupsafe import Markup
 from odoo import models, fields, api
 from datetime import date
 from dateutil.relativedelta import relativedelta
@@ -7,17 +6,28 @@ import re
 class LibraryMember(models.Model):
     _name = 'library.member'
     _description = 'Member come to our library.'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['mail.thread', 'mail.activity.mixin', 'library.image.mixin']
+    _rec_names_search = ['name', 'email', 'membership_id']
 
-    name = fields.Char(string="Name", required=True)
+    name = fields.Char(string="Name", required=True, index='trigram')
     dob = fields.Date(string="Date of Birth")
     gender = fields.Selection(string="Gender", selection=[('male', 'Male'), ('female', 'Female')], default="male")
-    image_1920 = fields.Binary(string="Photo")
-    email = fields.Char(string="Email", required=True)
+    image_1920 = fields.Image(string="Photo", max_width=1920, max_height=1920)
+    email = fields.Char(string="Email", required=True, index='trigram')
+    partner_id = fields.Many2one('res.partner', string="Portal Contact", index=True, ondelete='set null',
+                                 help="Contact whose portal user sees this member's rentals.")
     address = fields.Text(string="Address")
-    total_rental = fields.Float(string="Total Rental", compute="_compute_total_rental", store=True)
+    rental_ids = fields.One2many('library.rental', 'member_id', string="Rentals")
+    fee_line_ids = fields.One2many('library.rental.fee', 'member_id', string="Rental Fees")
+    event_ids = fields.One2many('library.circulation.event', 'member_id', string="History")
+    total_rental = fields.Float(string="Total Spent", compute="_compute_total_rental", store=True, index=True)
+    active_rental_count = fields.Integer(string="Active Rentals", compute="_compute_rental_stats", store=True)
+    overdue_rental_count = fields.Integer(string="Overdue Rentals", compute="_compute_rental_stats", store=True, index=True)
+    rental_count = fields.Integer(string="Lifetime Rentals", compute="_compute_rental_stats", store=True)
+    last_rental_date = fields.Date(string="Last Rental Date", compute="_compute_rental_stats", store=True)
     membership_id = fields.Char(
         string="Membership ID",
+        index='trigram',
         compute='_compute_membership_id',
         store=True,
         readonly=True,
@@ -40,62 +50,75 @@ class LibraryMember(models.Model):
         string="Book",
         tracking=False,
     )
-    available_book_ids = fields.Many2many('library.book', compute='_compute_available_books')
 
-    @api.depends('membership_id')
-    def _compute_available_books(self):
-        # Search all available books
+    _sql_constraints = [
+        ('membership_id_unique', 'unique(membership_id)', "The membership ID must be unique."),
+    ]
 
-        book_ids = self.book_id.ids
-        if book_ids:
-            domain = ['|', ('id', 'in', book_ids), ('status', '=', 'available')]
-        else:
-            domain = [('status', '=', 'available')]
-
-        available_book_ids = self.env['library.book'].search(domain)
-        for member in self:
-            member.available_book_ids = available_book_ids
-
-    @api.depends('book_id', 'message_ids')
+    @api.depends('fee_line_ids.amount')
     def _compute_total_rental(self):
-        pattern = re.compile(r'-\s*\$?\s*([0-9,.]+)')
-        for book in self:
-            total = 0.0
-            for msg in book.message_ids:
-                if msg.body:
-                    # Search for "Rental fee: $xxx.xx" pattern
-                    match = pattern.search(msg.body)
-                    if match:
-                        # Remove commas and convert to float
-                        amount_str = match.group(1).replace(',', '')
-                        try:
-                            amount = float(amount_str)
-                            total += amount
-                        except ValueError:
-                            pass
-            book.total_rental = total
+        # Total spent comes from the fee ledger, one grouped query for the whole batch
+        totals = dict(self.env['library.rental.fee']._read_group(
+            [('member_id', 'in', self._origin.ids)], ['member_id'], ['amount:sum']))
+        for member in self:
+            member.total_rental = totals.get(member._origin, 0.0)
+
+    @api.depends('rental_ids.state', 'rental_ids.rental_date')
+    def _compute_rental_stats(self):
+        stats = {member.id: {'active': 0, 'overdue': 0, 'total': 0, 'last': False} for member in self._origin}
+        groups = self.env['library.rental']._read_group(
+            [('member_id', 'in', self._origin.ids)],
+            ['member_id', 'state'],
+            ['__count', 'rental_date:max'],
+        )
+        for member, state, count, last_date in groups:
+            member_stats = stats[member.id]
+            member_stats['total'] += count
+            if state in ('confirmed', 'active'):
+                member_stats['active'] += count
+            elif state == 'overdue':
+                member_stats['overdue'] += count
+            if last_date and (not member_stats['last'] or last_date > member_stats['last']):
+                member_stats['last'] = last_date
+        for member in self:
+            member_stats = stats.get(member._origin.id, {})
+            member.active_rental_count = member_stats.get('active', 0)
+            member.overdue_rental_count = member_stats.get('overdue', 0)
+            member.rental_count = member_stats.get('total', 0)
+            member.last_rental_date = member_stats.get('last', False)
 
     @api.depends('expiry_date')
     def _compute_membership_id(self):
-        for record in self:
-            if not record.membership_id:
-                year_str = str(date.today().year)
-                prefix = 'M' + year_str
-
-                # Find last membership_id for this year (ignore current record)
-                last_member = self.search(
-                    [('membership_id', 'ilike', prefix), ('id', '!=', record.id)],
-                    order='membership_id desc',
-                    limit=1
-                )
-                if last_member:
-                    last_id = last_member.membership_id
-                    last_number = int(last_id[len(prefix):])
-                    new_number = last_number + 1
-                else:
-                    new_number = 1
-
-                record.membership_id = f"{prefix}{new_number:05d}"
+        # Only saved records get a number, onchange previews must not burn one
+        missing = self.filtered(lambda record: not record.membership_id and record.id)
+        for record, membership_id in zip(missing, self._allocate_membership_ids(len(missing))):
+            record.membership_id = membership_id
+
+    @api.model
+    def _allocate_membership_ids(self, count):
+        """Reserve ``count`` membership IDs of the form M<year>NNNNN in one round trip."""
+        if not count:
+            return []
+        prefix = 'M' + str(date.today().year)
+
+        def last_used_number():
+            # Compared as numbers, M2026100000 comes after M202699999
+            self.flush_model(['membership_id'])
+            self.env.cr.execute(
+                "SELECT MAX(substr(membership_id, %s)::bigint) FROM library_member WHERE membership_id ~ %s",
+                (len(prefix) + 1, f'^{prefix}\\d+$'),
+            )
+            return self.env.cr.fetchone()[0] or 0
+
+        first = self.env['library.sequence'].sudo()._reserve(f"library.member.{prefix}", count, last_used_number)
+        return [f"{prefix}{number:05d}" for number in range(first, first + count)]
+
+    @api.model
+    def name_search(self, name='', domain=None, operator='ilike', limit=100):
+        if name and operator == 'ilike':
+            members = self.env['library.search']._search_members(name, domain=domain, limit=limit)[0]
+            return [(member.id, member.display_name) for member in members]
+        return super().name_search(name, domain, operator, limit)
 
     @api.onchange('email')
     def onchange_email(self):
@@ -110,34 +133,17 @@ class LibraryMember(models.Model):
                     }
                 }
 
-    @api.model
+    @api.model_create_multi
     def create(self, vals_list):
-        if isinstance(vals_list, dict):
-            vals_list = [vals_list]
-
-        for vals in vals_list:
-            if vals.get('membership_id', 'New') == 'New':
-                year_str = str(date.today().year)
-                prefix = 'M' + year_str
-                last_member = self.search([('membership_id', 'ilike', prefix)], order='membership_id desc', limit=1)
-                if last_member:
-                    last_number = int(last_member.membership_id[len(prefix):])
-                    new_number = last_number + 1
-                else:
-                    new_number = 1
-                vals['membership_id'] = f"{prefix}{new_number:05d}"
+        to_number = [vals for vals in vals_list if vals.get('membership_id', 'New') == 'New']
+        for vals, membership_id in zip(to_number, self._allocate_membership_ids(len(to_number))):
+            vals['membership_id'] = membership_id
 
         records = super(LibraryMember, self).create(vals_list)
 
+        # Borrowed copies are logged as circulation events, not in the chatter
         for record in records:
-            if record.book_id:
-                lines = []
-                for book in record.book_id:
-                    symbol = book.currency_id.symbol or ''
-                    lines.append(f"- {book.title} - {symbol}{book.rental_fee:.2f}")
-                    book.status = 'borrowed'
-                message = "📘 Member borrowed book(s) at registration:<br/>" + "<br/>".join(lines)
-                record.message_post(body=Markup(message))
+            record.book_id._take_copies(record)
 
         return records
 
@@ -155,20 +161,9 @@ class LibraryMember(models.Model):
                 removed_book_ids = list(old_books - new_books)
 
                 if added_book_ids:
-                    added_books = self.env['library.book'].browse(added_book_ids)
-                    lines = []
-                    for book in added_books:
-                        symbol = book.currency_id.symbol or ''
-                        lines.append(f"- {book.title} - {symbol}{book.rental_fee:.2f}")
-                    added_books.with_context(from_member_form=True).write({'status': 'borrowed'})
-                    message = "📘 Member borrowed new book(s):<br/>" + "<br/>".join(lines)
-                    record.message_post(body=Markup(message))
+                    self.env['library.book'].browse(added_book_ids)._take_copies(record)
 
                 if removed_book_ids:
-                    removed_books = self.env['library.book'].browse(removed_book_ids)
-                    book_names = removed_books.mapped('title')
-                    removed_books.with_context(from_member_form=True).write({'status': 'available'})
-                    message = "📤 Member returned book(s): <b>" + ", ".join(book_names) + "</b>"
-                    record.message_post(body=Markup(message))
+                    self.env['library.book'].browse(removed_book_ids)._release_copies(record)
 
         return result
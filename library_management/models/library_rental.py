@@ -1,9 +1,22 @@
 from odoo import models, fields, api
+from odoo.tools import config
+from odoo.tools.sql import create_index, escape_psql
 from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from odoo.exceptions import UserError
-import base64,openpyxl,io
-from openpyxl.styles import Alignment
+from markupsafe import Markup
+import logging
+import threading
+import time
+
+_logger = logging.getLogger(__name__)
+
+# Advisory lock key and checkpoint of the overdue cron
+OVERDUE_LOCK_KEY = 0x4C49425244  # "LIBRD"
+OVERDUE_CHECKPOINT = 'library_management.overdue_checkpoint'
+
+# Rentals per page of the portal list
+PORTAL_PAGE_SIZE = 20
 
 class RentalSystem(models.Model):
     _name = 'library.rental'
@@ -17,26 +30,24 @@ class RentalSystem(models.Model):
         readonly=True,
         copy=False
     )
-    member_id = fields.Many2one('library.member', string="Member", required=True, tracking=True)
+    member_id = fields.Many2one('library.member', string="Member", required=True, tracking=True, index=True)
     book_ids = fields.Many2many(
         'library.book',  # target model
         string="Book",
         tracking=True,
         required=True,
     )
-    rental_date = fields.Date(string="Rental Date", default=fields.Date.context_today, required=True, tracking=True)
-    due_date = fields.Date(string="Due Date", required=True, tracking=True)
+    rental_date = fields.Date(string="Rental Date", default=fields.Date.context_today, required=True, tracking=True, index=True)
+    due_date = fields.Date(string="Due Date", required=True, tracking=True, index=True)
     return_date = fields.Date(string="Return Date", tracking=True)
     rental_fee = fields.Monetary(
         string="Rental Fee",
         currency_field='currency_id',
         compute='_compute_rental_fee',
-        tracking=True
     )
     total_rental = fields.Monetary(
         string="Total Rental",
         currency_field='currency_id',
-        tracking=True
     )
     currency_id = fields.Many2one(
         'res.currency',
@@ -52,9 +63,17 @@ class RentalSystem(models.Model):
         ('overdue', 'Overdue'),
     ], string="Status", default='draft', tracking=True,)
 
-    available_book_ids = fields.Many2many('library.book', compute='_compute_available_books')
+    fee_line_ids = fields.One2many('library.rental.fee', 'rental_id', string="Fee Lines")
+    copy_ids = fields.One2many('library.book.copy', 'rental_id', string="Copies Out")
+    event_ids = fields.One2many('library.circulation.event', 'rental_id', string="History")
+
     is_visible_due = fields.Date(default=date.today(), required=True)
 
+    def init(self):
+        # Keyset pagination of the portal list, per member and over all rentals
+        create_index(self.env.cr, 'library_rental_member_date_id_index', self._table, ['member_id', 'rental_date DESC', 'id DESC'])
+        create_index(self.env.cr, 'library_rental_date_id_index', self._table, ['rental_date DESC', 'id DESC'])
+
     def action_send_mail_rental(self):
         import logging
         _logger = logging.getLogger(__name__)
@@ -63,32 +82,146 @@ class RentalSystem(models.Model):
         if not template:
             _logger.warning("Email template NOT found: library_management.email_template_rental_overdue")
         else:
-            template.send_mail(self.id, force_send=True)
+            # Queued, the mail queue cron does the SMTP round trip
+            for rental in self:
+                template.send_mail(rental.id)
 
     @api.model
-    def update_overdue_states(self):
+    def update_overdue_states(self, batch_size=1000, time_budget=None):
+        """Mark past-due rentals overdue in id-ordered chunks, committing after each one.
+
+        Only one worker runs the job at a time. The advisory lock belongs to
+        the chunk transaction, so it goes away with any commit or rollback and
+        is taken again for the next chunk. When the time budget is spent the
+        job re-triggers itself and resumes after the last committed id.
+
+        Returns a summary: ``marked`` rentals in ``batches`` chunks up to
+        ``last_id``, and whether the run was ``skipped`` (another worker
+        holds the lock), ``rescheduled`` or ``finished``.
+        """
+        cr = self.env.cr
+        summary = {'marked': 0, 'batches': 0, 'last_id': 0, 'skipped': False, 'rescheduled': False, 'finished': False}
+
+        def lock():
+            cr.execute("SELECT pg_try_advisory_xact_lock(%s)", (OVERDUE_LOCK_KEY,))
+            return cr.fetchone()[0]
+
+        if not lock():
+            _logger.info("Overdue rental update is already running on another worker, skipping.")
+            summary['skipped'] = True
+            return summary
+
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        if time_budget is None:
+            limit = config['limit_time_real_cron'] if config['limit_time_real_cron'] > 0 else config['limit_time_real']
+            time_budget = limit * 0.8 if limit and limit > 0 else None
+        Params = self.env['ir.config_parameter'].sudo()
+        started = time.monotonic()
         today = fields.Date.today()
-        overdue_rentals = self.search([
-            ('due_date', '<', today),
-            ('return_date', '=', False),
-            ('state', '!=', 'returned')
-        ])
-        for rental in overdue_rentals:
-            rental.state = 'overdue'
-
-    @api.depends('state', 'book_ids')
-    def _compute_available_books(self):
-        # Search all available books
-        book_ids = self.book_ids.ids
-        if book_ids:
-            domain = ['|', ('id', 'in', book_ids), ('status', '=', 'available')]
-        else:
-            domain = [('status', '=', 'available')]
-
-        available_book_ids = self.env['library.book'].search(domain)
-        for member in self:
-            member.available_book_ids = available_book_ids
-
+        last_id = summary['last_id'] = int(Params.get_param(OVERDUE_CHECKPOINT, 0))
+        while True:
+            rentals = self.search([
+                ('id', '>', last_id),
+                ('due_date', '<', today),
+                ('return_date', '=', False),
+                ('state', 'in', ('confirmed', 'active')),
+            ], order='id', limit=batch_size)
+            if not rentals:
+                Params.set_param(OVERDUE_CHECKPOINT, 0)
+                summary['finished'] = True
+                break
+
+            # One bulk write per chunk, no tracking message per rental
+            rentals.with_context(tracking_disable=True).write({'state': 'overdue'})
+            last_id = summary['last_id'] = rentals[-1].id
+            summary['marked'] += len(rentals)
+            summary['batches'] += 1
+            Params.set_param(OVERDUE_CHECKPOINT, last_id)
+            if auto_commit:
+                cr.commit()
+            self.env.invalidate_all()
+
+            if time_budget and time.monotonic() - started > time_budget:
+                _logger.info("Overdue rental update paused after id %s, rescheduling.", last_id)
+                cron = self.env.ref('library_management.ir_cron_update_overdue_rentals', raise_if_not_found=False)
+                if cron:
+                    cron._trigger()
+                summary['rescheduled'] = True
+                break
+            if not lock():
+                # Another worker took over between two chunks, it resumes from the checkpoint
+                _logger.info("Overdue rental update handed over after id %s.", last_id)
+                break
+        summary['seconds'] = time.monotonic() - started
+        _logger.info(
+            "Marked %(marked)s rental(s) as overdue in %(batches)s chunk(s) up to id %(last_id)s "
+            "(finished: %(finished)s, rescheduled: %(rescheduled)s).", summary)
+        return summary
+
+    def _checkout_copies(self):
+        """Lend every open rental one copy of each of its books that has none yet.
+
+        Copies listed in the ``checkout_copy_ids`` context key, scanned at the
+        desk, are used first.
+        """
+        preferred = self.env['library.book.copy'].browse(self.env.context.get('checkout_copy_ids', []))
+        rentals = self.filtered(lambda r: r.state in ('confirmed', 'active', 'overdue'))
+        for rental in rentals:
+            missing = rental.book_ids - rental.copy_ids.book_id
+            missing._take_copies(rental.member_id, rental, preferred)
+
+    def _release_copies(self, books=None):
+        # Copies of ``books`` (all books by default) go back on the shelf, lost ones stay lost
+        copies = self.copy_ids if books is None else self.copy_ids.filtered(lambda copy: copy.book_id in books)
+        copies.filtered(lambda copy: copy.status == 'borrowed').write({'status': 'available', 'member_id': False, 'rental_id': False})
+        copies.filtered(lambda copy: copy.status != 'borrowed').write({'member_id': False, 'rental_id': False})
+
+    def _sync_fee_lines(self):
+        # Keep one charged line per book; draft rentals are not charged and
+        # charges taken back are reversed, the fee ledger is never rewritten
+        Fee = self.env['library.rental.fee'].sudo()
+        lines = Fee.search([('rental_id', 'in', self.ids), ('state', '=', 'charged')])
+        existing = {(line.rental_id.id, line.book_id.id): line for line in lines}
+        charged = set()
+        vals_list = []
+        for rental in self:
+            if rental.state == 'draft':
+                continue
+            for book in rental.book_ids:
+                key = (rental.id, book.id)
+                charged.add(key)
+                if key not in existing:
+                    vals_list.append({
+                        'rental_id': rental.id,
+                        'book_id': book.id,
+                        'copy_id': rental.copy_ids.filtered(lambda copy: copy.book_id == book)[:1].id,
+                        'member_id': rental.member_id.id,
+                        'amount': book.rental_fee,
+                        'currency_id': rental.currency_id.id,
+                        'charge_date': rental.rental_date,
+                    })
+        stale = lines.filtered(lambda line: (line.rental_id.id, line.book_id.id) not in charged)
+        stale._reverse()
+        lines -= stale
+
+        # Lines follow the member of their rental, grouped by member
+        by_member = {}
+        for line in lines:
+            if line.member_id != line.rental_id.member_id:
+                by_member[line.rental_id.member_id.id] = by_member.get(line.rental_id.member_id.id, Fee) | line
+        for member_id, group in by_member.items():
+            group.write({'member_id': member_id})
+        lines |= Fee.create(vals_list)
+
+        # Close the lines of returned rentals, grouped by return date
+        to_close = {}
+        for line in lines:
+            rental = line.rental_id
+            if rental.state == 'returned' and not line.return_date:
+                return_date = rental.return_date or fields.Date.today()
+                to_close[return_date] = to_close.get(return_date, Fee) | line
+        for return_date, group in to_close.items():
+            group.write({'return_date': return_date})
 
     @api.depends('book_ids')
     def _compute_rental_fee(self):
@@ -112,34 +245,32 @@ class RentalSystem(models.Model):
 
 
     @api.model
-    def create(self, vals):
-        self.check_due_date()
-        res = super().create(vals)
-        res.write({'name': f"R{res.id:06d}"})
+    def _allocate_rental_numbers(self, count):
+        # R000123 numbers from nextval(), gaps are left by rolled back checkouts
+        Sequence = self.env['ir.sequence'].sudo()
+        return [Sequence.next_by_code('library.rental') for __ in range(count)]
 
-        if 'book_ids' in vals and vals.get('member_id'):
-            book_ids = []
+    @api.model_create_multi
+    def create(self, vals_list):
+        to_number = [vals for vals in vals_list if not vals.get('name')]
+        for vals, name in zip(to_number, self._allocate_rental_numbers(len(to_number))):
+            vals['name'] = name
 
-            # Handle different command types in the many2many field
-            for command in vals['book_ids']:
-                if command[0] == 4:  # Link to existing record
-                    book_ids.append(command[1])
-                elif command[0] == 6:  # Replace all with new list of IDs
-                    book_ids.extend(command[2])
-
-            if book_ids and 'draft' not in vals['state']:
-                books = self.env['library.book'].browse(book_ids)
-                books.with_context(from_member_form=True).write({
-                    'status': 'borrowed',
-                    'member_id': vals['member_id']
-                })
+        rentals = super().create(vals_list)
+        self.env['library.circulation.event']._log_states(rentals)
 
-        return res
+        rentals._checkout_copies()
+        rentals._sync_fee_lines()
+        Rollup = self.env['library.rental.rollup']
+        Rollup._apply({}, Rollup._get_contributions(rentals.ids))
+        self.env['library.dashboard.snapshot']._invalidate()
+
+        return rentals
 
-    @api.model
     def write(self, vals):
+        Book = self.env['library.book']
 
-            # Keep track of added and removed book IDs
+        # Keep track of added and removed book IDs
         added_books = set()
         removed_books = set()
 
@@ -155,34 +286,42 @@ class RentalSystem(models.Model):
                     old_ids = set(self.book_ids.ids)
                     added_books |= new_ids - old_ids
                     removed_books |= old_ids - new_ids
-        if 'state' in vals and vals['state'] == 'confirmed' and 'book_ids' not in vals:
-            books = self.env['library.book'].browse(self.book_ids.ids)
-            for book in books:
-                if book.status == 'borrowed':
-                    raise UserError(f"The book '{book.title}' is not available (already borrowed).")
-        # Apply status changes for added/removed books
-        if added_books and 'state' in vals and 'draft' not in vals['state']:
-            if 'state' in vals and vals['state'] == 'confirmed':
-                books = self.env['library.book'].browse(added_books)
-                for book in books:
-                    if book.status == 'borrowed':
-                        raise UserError(f"The book '{book.title}' is not available (already borrowed).")
-
-            self.env['library.book'].browse(list(added_books)).with_context(from_member_form=True).write(
-                {'status': 'borrowed'})
-        if removed_books:
-            self.env['library.book'].browse(list(removed_books)).with_context(from_member_form=True).write(
-                {'status': 'available'})
-        if 'state' in vals and 'draft' not in vals['state'] and 'book_ids' not in vals:
-             self.env['library.book'].browse(self.book_ids.ids).with_context(from_member_form=True).write(
-                {'status': 'borrowed'})
-        # Call super to write vals
-        result = super().write(vals)
-        # Handle state change to 'returned'
-        if 'state' in vals and vals['state'] in ['returned', 'draft']:
+
+        state = vals.get('state')
+        if state == 'confirmed':
             for rec in self:
-                rec.book_ids.with_context(from_member_form=True).write({'status': 'available'})
+                to_check = Book.browse(added_books) if 'book_ids' in vals else rec.book_ids
+                member = self.env['library.member'].browse(vals['member_id']) if vals.get('member_id') else rec.member_id
+                borrowed = to_check._get_unavailable(member)
+                if borrowed:
+                    raise UserError(f"The book '{borrowed[0].title}' is not available (already borrowed).")
+        # Only rentals that were out can give books back
+        was_open = any(rec.state != 'draft' for rec in self)
+        Rollup = self.env['library.rental.rollup']
+        rollup_before = Rollup._get_contributions(self.ids) if {'state', 'rental_date', 'book_ids'} & set(vals) else None
+
+        Event = self.env['library.circulation.event']
+        snapshot = Event._snapshot(self) if state else None
 
+        # Call super to write vals
+        result = super().write(vals)
+        if snapshot is not None:
+            Event._log_states(self, snapshot)
+
+        # Copies are lent and given back after the new rental state is
+        # written, the book engine then resolves the borrower of each title
+        if removed_books and was_open:
+            self._release_copies(Book.browse(sorted(removed_books)))
+        if state in ('returned', 'draft'):
+            self._release_copies()
+        elif state or 'book_ids' in vals:
+            self._checkout_copies()
+        if state or {'book_ids', 'member_id'} & set(vals):
+            self._sync_fee_lines()
+        if rollup_before is not None:
+            Rollup._apply(rollup_before, Rollup._get_contributions(self.ids))
+        if state or 'rental_date' in vals:
+            self.env['library.dashboard.snapshot']._invalidate()
 
         return result
 
@@ -190,7 +329,12 @@ class RentalSystem(models.Model):
         for rec in self:
             if rec.state not in ['returned']:
                 raise UserError("Cannot delete a record unless it's not returned yet.")
-        return super(RentalSystem, self).unlink()
+        Rollup = self.env['library.rental.rollup']
+        rollup_before = Rollup._get_contributions(self.ids)
+        self.env['library.dashboard.snapshot']._invalidate()
+        res = super(RentalSystem, self).unlink()
+        Rollup._apply(rollup_before, {})
+        return res
 
     # State transition methods
     def action_confirm(self):
@@ -221,6 +365,36 @@ class RentalSystem(models.Model):
             }
         }
 
+    def action_bulk_return(self):
+        # List view action and RPC entry point
+        self._bulk_return()
+        return True
+
+    def _bulk_return(self, return_date=None, states=('active', 'overdue')):
+        """Return every rental in self with one grouped write.
+
+        All rentals are validated before anything is written. Their copies go
+        back on the shelf together and each member gets one summary message
+        instead of a tracking message per rental.
+        """
+        return_date = return_date or fields.Date.context_today(self)
+        for rental in self:
+            if rental.state not in states:
+                raise UserError(f"Only Active or Overdue rentals can be returned, {rental.name} is {rental.state}.")
+            if return_date < rental.rental_date:
+                raise UserError(f"Can't return {rental.name}, its rental date {rental.rental_date} is after {return_date}.")
+        if not self:
+            return self
+        self.with_context(tracking_disable=True).write({'state': 'returned', 'return_date': return_date})
+
+        rentals_by_member = {}
+        for rental in self:
+            rentals_by_member[rental.member_id] = rentals_by_member.get(rental.member_id, self.browse()) | rental
+        for member, rentals in rentals_by_member.items():
+            lines = [f"- {rental.name}: {', '.join(rental.book_ids.mapped('title'))}" for rental in rentals]
+            member.message_post(body=Markup("📤 Returned %s rental(s) on %s:<br/>%s") % (
+                len(rentals), return_date, Markup("<br/>").join(lines)))
+        return self
 
     def action_mark_overdue(self):
         for rec in self:
@@ -246,57 +420,198 @@ class RentalSystem(models.Model):
             'target': 'new',
         }
 
-    def generate_and_send_report(self):
-        # Fetch records
-        start_date = datetime.now() - relativedelta(months=1)
-        end_date = datetime.now()
-        domain = [
-            ('rental_date', '>=', start_date),
-            ('rental_date', '<=', end_date)
-        ]
-        rentals = self.env['library.rental'].sudo().search(domain)
-
-        # Create XLSX
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = 'Rental Report'
-        ws.append(['Book', 'Due Date', 'Member', 'Rental Date', 'Rental Fee', 'Return Date', 'Status'])
-
-        ws.column_dimensions['A'].width = 30  # Book Title
-        ws.column_dimensions['B'].width = 30  # Date
-        ws.column_dimensions['C'].width = 30  # Customer
-        ws.column_dimensions['D'].width = 30  # Start
-        ws.column_dimensions['E'].width = 30  # Fee
-        ws.column_dimensions['F'].width = 30  # Return
-        ws.column_dimensions['G'].width = 30  # State
-        for r in rentals:
-            book_title = ', '.join(r.book_ids.mapped('title'))
-            ws.append([book_title, r.due_date, r.member_id.name, r.rental_date, r.rental_fee, r.return_date, r.state])
-
-        for row in ws.iter_rows(min_row=2):
-            row[0].alignment = Alignment(wrap_text=True)
-
-        fp = io.BytesIO()
-        wb.save(fp)
-        fp.seek(0)
-        xlsx_data = fp.read()
-
-        # Send Email
-        attachment = self.env['ir.attachment'].create({
-            'name': f"rental_report_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            'type': 'binary',
-            'datas': base64.b64encode(xlsx_data),
-            'res_model': 'library.rental',
-            'res_id': self.id,
-            'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    def generate_and_send_report(self, start_date=None, end_date=None, recipients=None):
+        """Queue the rental report of a period by mail, the previous month by default.
+
+        The XLSX of a closed month comes from its snapshot, so sending it
+        again reuses the stored file. Recipients default to the comma separated
+        ``library_management.report_recipients`` system parameter.
+        """
+        if not start_date or not end_date:
+            first_day = date.today().replace(day=1)
+            start_date, end_date = first_day - relativedelta(months=1), first_day - timedelta(days=1)
+        recipients = (
+            recipients
+            or self.env['ir.config_parameter'].sudo().get_param('library_management.report_recipients')
+            or self.env.company.email
+        )
+        if not recipients:
+            raise UserError("Set the report recipients in the 'library_management.report_recipients' system parameter.")
+
+        Export = self.env['library.rental.export']
+        mail = self.env['mail.mail'].sudo().create({
+            'subject': f"Rental Report {start_date} - {end_date}",
+            'body_html': f"<p>Please find attached the rental report from {start_date} to {end_date}.</p>",
+            'email_to': recipients,
         })
+        if Export._is_closed_period(start_date, end_date):
+            attachment = Export._get_snapshot(start_date, end_date)
+        else:
+            attachment = Export._build_attachment(start_date, end_date, res_model='mail.mail', res_id=mail.id)
+        mail.attachment_ids = [(4, attachment.id)]
+        return True
 
-        # Replace with your real recipient email
-        recipient_email = 'admin@example.com'
-        mail_values = {
-            'subject': 'Monthly Rental Report',
-            'body_html': '<p>Please find attached the monthly rental report.</p>',
-            'email_to': recipient_email,
-            'attachment_ids': [(6, 0, [attachment.id])],
+    @api.model
+    def _get_portal_page(self, domain, sort='newest', after=None, before=None, limit=PORTAL_PAGE_SIZE):
+        """One page of rentals ordered on ``(rental_date, id)``, with keyset pagination.
+
+        ``after`` and ``before`` are the ``<date>_<id>`` cursors of the last and
+        first row of the current page. Member names come with the page read
+        and the book titles and fees of the page from one join.
+        """
+        descending = sort != 'oldest'
+        cursor, backwards = (before, True) if before else (after, False)
+        domain = list(domain)
+        try:
+            cursor_date, cursor_id = cursor.split('_')
+            cursor_date, cursor_id = fields.Date.to_date(cursor_date), int(cursor_id)
+        except (AttributeError, ValueError):
+            cursor = None
+        # Reading the previous page walks backwards from its first row
+        forward = descending != backwards
+        if cursor:
+            operator = '<' if forward else '>'
+            domain += ['|', ('rental_date', operator, cursor_date),
+                       '&', ('rental_date', '=', cursor_date), ('id', operator, cursor_id)]
+        direction = 'desc' if forward else 'asc'
+        records = self.search_read(
+            domain,
+            ['name', 'member_id', 'rental_date', 'due_date', 'return_date', 'state'],
+            order=f"rental_date {direction}, id {direction}",
+            limit=limit + 1,
+        )
+        has_more = len(records) > limit
+        records = records[:limit]
+        if backwards:
+            records.reverse()
+
+        books = self.env['library.rental.export']._get_book_info([record['id'] for record in records])
+        states = dict(self._fields['state']._description_selection(self.env))
+        rows = []
+        for record in records:
+            titles, fee = books.get(record['id'], ('', 0.0))
+            rows.append({
+                'id': record['id'],
+                'name': record['name'],
+                'member': record['member_id'][1] if record['member_id'] else '',
+                'books': titles,
+                'rental_date': record['rental_date'],
+                'due_date': record['due_date'],
+                'return_date': record['return_date'],
+                'rental_fee': fee or 0.0,
+                'state': states.get(record['state'], record['state']),
+                'cursor': f"{record['rental_date']}_{record['id']}",
+            })
+        return {
+            'rows': rows,
+            'prev_cursor': rows[0]['cursor'] if rows and (has_more if backwards else cursor) else None,
+            'next_cursor': rows[-1]['cursor'] if rows and (cursor if backwards else has_more) else None,
         }
-        self.env['mail.mail'].sudo().create(mail_values).send()
+
+    @api.model
+    def _desk_checkout(self, member_ref, codes, due_date=None):
+        """Check the scanned books out to a member in one rental.
+
+        ``member_ref`` is a membership ID or an email, ``codes`` the scanned
+        ISBNs or copy barcodes. Every code gets its own result, the available books are rented
+        together and unknown or unavailable ones are reported without failing
+        the others.
+        """
+        today = fields.Date.context_today(self)
+        try:
+            due_date = fields.Date.to_date(due_date) or today + relativedelta(months=1)
+        except (TypeError, ValueError):
+            return {'rental': False, 'error': f"Invalid due date '{due_date}', use the YYYY-MM-DD format.", 'items': []}
+        # Case-insensitive but exact, '_' and '%' in an email are not wildcards
+        member = self.env['library.member'].search(
+            ['|', ('membership_id', '=', member_ref), ('email', '=ilike', escape_psql(member_ref))], limit=1) if member_ref else None
+        if not member:
+            return {'rental': False, 'error': f"Member '{member_ref}' not found.", 'items': []}
+        if member.expiry_date and member.expiry_date < today:
+            return {'rental': False, 'error': f"The membership of {member.name} expired on {member.expiry_date}.", 'items': []}
+        if due_date <= today:
+            return {'rental': False, 'error': "The due date must be after today.", 'items': []}
+
+        resolved = self.env['library.book']._resolve_codes(codes)
+        scanned = self.env['library.book'].union(*(book for book, __ in resolved.values()))
+        unavailable = scanned._get_unavailable(member)
+        kept = self.env['library.book.hold'].search([('member_id', '=', member.id), ('state', '=', 'ready')]).copy_id
+        books = self.env['library.book']
+        copies = self.env['library.book.copy']
+        items = []
+        for code in codes:
+            book, copy = resolved[code]
+            if not book:
+                items.append({'code': code, 'ok': False, 'book': False, 'message': "Unknown ISBN or barcode."})
+            elif book in books:
+                items.append({'code': code, 'ok': False, 'book': book.title, 'message': "This title is already in the checkout."})
+            elif copy and copy.status != 'available' and copy not in kept:
+                items.append({'code': code, 'ok': False, 'book': book.title, 'message': f"Copy {copy.barcode} is {copy.status}."})
+            elif book in unavailable:
+                items.append({'code': code, 'ok': False, 'book': book.title, 'message': "No copy of this book is available."})
+            else:
+                books |= book
+                copies |= copy
+                items.append({'code': code, 'ok': True, 'book': book.title, 'message': "Checked out."})
+
+        rental = self.browse()
+        if books:
+            # Scanned copies are lent as such, ISBN scans take any copy on the shelf
+            rental = self.with_context(checkout_copy_ids=copies.ids, tracking_disable=True).create({
+                'member_id': member.id,
+                'book_ids': [(6, 0, books.ids)],
+                'rental_date': today,
+                'due_date': due_date,
+                'state': 'active',
+            })
+        return {'rental': rental.name or False, 'error': False, 'items': items}
+
+    @api.model
+    def _desk_return(self, codes):
+        """Return the open rentals of the scanned books.
+
+        A rental is only closed when all of its books were scanned, the books
+        of a partly scanned rental are reported with the titles still missing.
+        """
+        resolved = self.env['library.book']._resolve_codes(codes)
+        scanned = self.env['library.book'].union(*(book for book, __ in resolved.values()))
+        rentals = self.search([('book_ids', 'in', scanned.ids), ('state', 'in', ('confirmed', 'active', 'overdue'))])
+        rentals_by_book = {}
+        for rental in rentals:
+            for book in rental.book_ids:
+                rentals_by_book[book.id] = rentals_by_book.get(book.id, self.browse()) | rental
+
+        # A copy barcode names its rental, an ISBN only when one rental has the title out
+        matches = []
+        scanned_by_rental = {}
+        for code in codes:
+            book, copy = resolved[code]
+            rental = copy.rental_id if copy else rentals_by_book.get(book.id, self.browse())
+            if book and len(rental) == 1:
+                scanned_by_rental[rental.id] = scanned_by_rental.get(rental.id, self.env['library.book']) | book
+            matches.append((code, book, rental))
+        to_close = rentals.filtered(lambda rental: not (rental.book_ids - scanned_by_rental.get(rental.id, scanned.browse())))
+
+        items = []
+        seen = set()
+        for code, book, rental in matches:
+            if not book:
+                items.append({'code': code, 'ok': False, 'book': False, 'message': "Unknown ISBN or barcode."})
+            elif (book.id, rental.ids[0] if len(rental) == 1 else None) in seen:
+                items.append({'code': code, 'ok': False, 'book': book.title, 'message': "Scanned twice."})
+            elif not rental:
+                items.append({'code': code, 'ok': False, 'book': book.title, 'message': "The book is not checked out."})
+            elif len(rental) > 1:
+                items.append({'code': code, 'ok': False, 'book': book.title,
+                              'message': "Several copies of this title are out, scan the copy barcode."})
+            elif rental not in to_close:
+                missing = ', '.join((rental.book_ids - scanned_by_rental[rental.id]).mapped('title'))
+                items.append({'code': code, 'ok': False, 'book': book.title,
+                              'message': f"Rental {rental.name} also has {missing} out, scan all its books to return it."})
+            else:
+                items.append({'code': code, 'ok': True, 'book': book.title, 'message': f"Returned with {rental.name}."})
+            if book:
+                seen.add((book.id, rental.ids[0] if len(rental) == 1 else None))
+
+        to_close._bulk_return(states=('confirmed', 'active', 'overdue'))
+        return {'rentals': to_close.mapped('name'), 'items': items}
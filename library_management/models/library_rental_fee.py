@@ -0,0 +1,66 @@
+from odoo import models, fields
+from odoo.tools import SQL
+from odoo.tools.sql import index_exists
+
+
+class RentalFee(models.Model):
+    _name = 'library.rental.fee'
+    _description = 'Rental fee charged per rented book'
+    _order = 'charge_date desc, id desc'
+
+    rental_id = fields.Many2one('library.rental', string="Rental", index=True, ondelete='set null')
+    book_id = fields.Many2one('library.book', string="Book", required=True, index=True, ondelete='cascade')
+    copy_id = fields.Many2one('library.book.copy', string="Copy", index=True, ondelete='set null')
+    member_id = fields.Many2one('library.member', string="Member", index=True)
+    amount = fields.Monetary(string="Amount", currency_field='currency_id')
+    currency_id = fields.Many2one('res.currency', string="Currency", required=True)
+    charge_date = fields.Date(string="Charge Date", required=True, default=fields.Date.context_today)
+    return_date = fields.Date(string="Return Date")
+    state = fields.Selection([
+        ('charged', 'Charged'),
+        ('reversed', 'Reversed'),
+        ('reversal', 'Reversal'),
+    ], string="Status", default='charged', required=True, index=True, readonly=True,
+        help="Lines are never deleted: a charge that is taken back keeps its amount and is "
+             "offset by a reversal line with the opposite amount, dated on the day it was taken back.")
+    reversed_id = fields.Many2one('library.rental.fee', string="Reverses", readonly=True, ondelete='set null')
+
+    def init(self):
+        cr = self.env.cr
+        # Reversed charges stay next to the new charge of the same book, only charged lines are unique
+        cr.execute("ALTER TABLE library_rental_fee DROP CONSTRAINT IF EXISTS library_rental_fee_rental_book_unique")
+        cr.execute("DROP INDEX IF EXISTS library_rental_fee_open_copy_unique")
+        if not index_exists(cr, 'library_rental_fee_charged_rental_book_unique'):
+            cr.execute(SQL(
+                "CREATE UNIQUE INDEX %s ON %s (rental_id, book_id) WHERE state = 'charged'",
+                SQL.identifier('library_rental_fee_charged_rental_book_unique'), SQL.identifier(self._table),
+            ))
+        # A copy is charged to one open rental at a time, enforced by the database
+        if not index_exists(cr, 'library_rental_fee_charged_copy_unique'):
+            cr.execute(SQL(
+                "CREATE UNIQUE INDEX %s ON %s (copy_id) WHERE copy_id IS NOT NULL AND return_date IS NULL AND state = 'charged'",
+                SQL.identifier('library_rental_fee_charged_copy_unique'), SQL.identifier(self._table),
+            ))
+
+    def _reverse(self):
+        """Take the charged lines in self back with one reversal line each.
+
+        The charges keep their amount and date, so past revenue and totals do
+        not change; the reversal is booked today.
+        """
+        lines = self.filtered(lambda line: line.state == 'charged')
+        if not lines:
+            return self.browse()
+        reversals = self.create([{
+            'rental_id': line.rental_id.id,
+            'book_id': line.book_id.id,
+            'copy_id': line.copy_id.id,
+            'member_id': line.member_id.id,
+            'amount': -line.amount,
+            'currency_id': line.currency_id.id,
+            'charge_date': fields.Date.context_today(self),
+            'state': 'reversal',
+            'reversed_id': line.id,
+        } for line in lines])
+        lines.write({'state': 'reversed'})
+        return reversals
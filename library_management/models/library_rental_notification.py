@@ -0,0 +1,89 @@
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class RentalNotification(models.Model):
+    _name = 'library.rental.notification'
+    _description = 'Rental reminder digest sent to a member'
+    _order = 'period desc, id desc'
+
+    member_id = fields.Many2one('library.member', string="Member", required=True, index=True, ondelete='cascade')
+    period = fields.Date(string="Period", required=True, index=True)
+    rental_ids = fields.Many2many('library.rental', string="Rentals")
+    overdue_count = fields.Integer(string="Overdue")
+    due_soon_count = fields.Integer(string="Due Soon")
+    mail_id = fields.Many2one('mail.mail', string="Mail", ondelete='set null')
+
+    _sql_constraints = [
+        ('member_period_unique', 'unique(member_id, period)', "A member gets one reminder per period."),
+    ]
+
+    @api.model
+    def _cron_send_reminders(self, due_soon_days=3, period_days=1, batch_size=200, limit=2000):
+        """Queue one digest mail per member for overdue and soon-due rentals.
+
+        Mails are only queued in mail.mail, the mail queue cron sends them.
+        At most ``limit`` digests are queued per run; the cron is re-triggered
+        when more members are waiting.
+        """
+        template = self.env.ref('library_management.email_template_rental_digest', raise_if_not_found=False)
+        if not template:
+            _logger.warning("Email template NOT found: library_management.email_template_rental_digest")
+            return 0
+
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        today = fields.Date.today()
+        period = today - timedelta(days=today.toordinal() % period_days)
+
+        # One indexed due-date query grouped per member
+        notified = self.search([('period', '=', period)]).member_id
+        groups = self.env['library.rental']._read_group(
+            [
+                ('due_date', '<=', today + timedelta(days=due_soon_days)),
+                ('return_date', '=', False),
+                ('state', 'in', ('confirmed', 'active', 'overdue')),
+                ('member_id', 'not in', notified.ids),
+            ],
+            ['member_id'],
+            ['id:array_agg'],
+            order='member_id',
+        )
+        pending = groups[limit:] if limit else []
+        groups = groups[:limit] if limit else groups
+
+        Rental = self.env['library.rental']
+        sent = 0
+        for index in range(0, len(groups), batch_size):
+            batch = groups[index:index + batch_size]
+            batch_rentals = Rental.browse([rental_id for __, rental_ids in batch for rental_id in rental_ids])
+            vals_list = []
+            for member, rental_ids in batch:
+                rentals = Rental.browse(rental_ids).with_prefetch(batch_rentals._prefetch_ids)
+                overdue = rentals.filtered(lambda r: r.state == 'overdue' or r.due_date < today)
+                vals_list.append({
+                    'member_id': member.id,
+                    'period': period,
+                    'rental_ids': [(6, 0, rentals.ids)],
+                    'overdue_count': len(overdue),
+                    'due_soon_count': len(rentals) - len(overdue),
+                })
+            notifications = self.create(vals_list)
+            mails = template.send_mail_batch(notifications.ids, force_send=False)
+            if len(mails) == len(notifications):
+                for notification, mail in zip(notifications, mails):
+                    notification.mail_id = mail
+            sent += len(notifications)
+            if auto_commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+
+        if pending:
+            cron = self.env.ref('library_management.ir_cron_send_rental_reminders', raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+        _logger.info("Queued %s rental reminder digest(s), %s member(s) left for the next run.", sent, len(pending))
+        return sent
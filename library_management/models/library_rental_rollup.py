@@ -0,0 +1,184 @@
+from odoo import models, fields, api
+from odoo.tools import SQL
+from odoo.tools.sql import create_index
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('day', 'week', 'month', 'year')
+
+
+class RentalRollup(models.Model):
+    _name = 'library.rental.rollup'
+    _description = 'Daily rental counts by state and genre'
+    _order = 'date'
+    _log_access = False
+
+    date = fields.Date(string="Date", required=True, index=True)
+    state = fields.Selection(selection=lambda self: self.env['library.rental']._fields['state'].selection, string="Status")
+    genre = fields.Selection(selection=lambda self: self.env['library.book']._fields['genre'].selection, string="Genre")
+    is_total = fields.Boolean(string="All Genres", help="Row counts every rental of the day and state, whatever the genre of its books.")
+    rental_count = fields.Integer(string="Rentals")
+    book_count = fields.Integer(string="Books")
+
+    def init(self):
+        # Deltas are appended, a grain can have several rows until the fold cron merges them
+        self.env.cr.execute(SQL("DROP INDEX IF EXISTS %s", SQL.identifier('library_rental_rollup_grain_unique')))
+        create_index(self.env.cr, 'library_rental_rollup_grain_index', self._table, ['date', 'state', 'is_total'])
+
+    def _select_rows(self, rental_filter):
+        Rental = self.env['library.rental']
+        Rental.flush_model(['rental_date', 'state', 'book_ids'])
+        self.env['library.book'].flush_model(['genre'])
+        book_field = Rental._fields['book_ids']
+        return SQL("""
+            SELECT r.rental_date, r.state, b.genre, GROUPING(b.genre) = 1, COUNT(DISTINCT r.id), COUNT(b.id)
+              FROM library_rental r
+         LEFT JOIN %(rel)s rel ON rel.%(rental_col)s = r.id
+         LEFT JOIN library_book b ON b.id = rel.%(book_col)s
+             WHERE %(rental_filter)s
+          GROUP BY GROUPING SETS ((r.rental_date, r.state), (r.rental_date, r.state, b.genre))
+            """,
+            rel=SQL.identifier(book_field.relation),
+            rental_col=SQL.identifier(book_field.column1),
+            book_col=SQL.identifier(book_field.column2),
+            rental_filter=rental_filter,
+        )
+
+    @api.model
+    def _rebuild(self):
+        """Rebuild every rollup row from the rentals."""
+        self.env.cr.execute(SQL("DELETE FROM library_rental_rollup"))
+        self.env.cr.execute(SQL(
+            "INSERT INTO library_rental_rollup (date, state, genre, is_total, rental_count, book_count) %s",
+            self._select_rows(SQL("TRUE")),
+        ))
+        self.invalidate_model()
+
+    @api.model
+    def _get_contributions(self, rental_ids):
+        """What the given rentals add to the rollup, as ``{(date, state, genre, is_total): (rentals, books)}``."""
+        if not rental_ids:
+            return {}
+        self.env.cr.execute(self._select_rows(SQL("r.id = ANY(%s)", list(rental_ids))))
+        return {
+            (day, state, genre, is_total): (rental_count, book_count)
+            for day, state, genre, is_total, rental_count, book_count in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _apply(self, before, after):
+        """Append the signed difference of two contributions to the rollup.
+
+        ``before`` is taken before the rentals change and ``after`` once they
+        did. The difference is inserted as new rows, readers sum the rows of
+        a grain, so concurrent checkouts of a day never update the same row.
+        """
+        rows = []
+        for key in set(before) | set(after):
+            old_rentals, old_books = before.get(key, (0, 0))
+            new_rentals, new_books = after.get(key, (0, 0))
+            if (new_rentals - old_rentals, new_books - old_books) != (0, 0):
+                rows.append(key + (new_rentals - old_rentals, new_books - old_books))
+        if not rows:
+            return
+        self.env.cr.execute("""
+            INSERT INTO library_rental_rollup (date, state, genre, is_total, rental_count, book_count)
+                 SELECT * FROM unnest(%s::date[], %s::varchar[], %s::varchar[], %s::bool[], %s::int[], %s::int[])
+        """, [list(column) for column in zip(*rows)])
+        self.invalidate_model()
+
+    @api.model
+    def _cron_fold(self, limit=50000):
+        """Merge the rows of every grain that has more than one, oldest first.
+
+        Rows taken by another worker are skipped. The merged rows are deleted
+        and their sum inserted in the same statement, so readers never count
+        them twice. Grains that sum to zero disappear.
+        """
+        self.env.cr.execute("""
+            WITH moved AS (
+                DELETE FROM library_rental_rollup
+                 WHERE id IN (
+                       SELECT id
+                         FROM library_rental_rollup
+                        WHERE (date, state, COALESCE(genre, ''), is_total) IN (
+                              SELECT date, state, COALESCE(genre, ''), is_total
+                                FROM library_rental_rollup
+                            GROUP BY date, state, COALESCE(genre, ''), is_total
+                              HAVING COUNT(*) > 1)
+                     ORDER BY id
+                        LIMIT %s
+                          FOR UPDATE SKIP LOCKED)
+             RETURNING date, state, genre, is_total, rental_count, book_count
+            )
+            INSERT INTO library_rental_rollup (date, state, genre, is_total, rental_count, book_count)
+                 SELECT date, state, genre, is_total, SUM(rental_count), SUM(book_count)
+                   FROM moved
+               GROUP BY date, state, genre, is_total
+                 HAVING SUM(rental_count) != 0 OR SUM(book_count) != 0
+        """, (limit,))
+        folded = self.env.cr.rowcount
+        self.invalidate_model()
+        _logger.info("Folded the rental rollup into %s row(s).", folded)
+        return folded
+
+    @api.model
+    def _get_series(self, date_from=None, date_to=None, granularity='month', group_by=None):
+        """Chart series of rental counts, read from the rollup only.
+
+        Returns ``{'labels': [...], 'datasets': [{'key', 'label', 'data'}]}``
+        with one dataset per state or genre, or a single total dataset.
+        """
+        if granularity not in GRANULARITIES:
+            granularity = 'month'
+        if group_by not in ('state', 'genre'):
+            group_by = None
+        date_to = fields.Date.to_date(date_to) or fields.Date.context_today(self)
+        date_from = fields.Date.to_date(date_from) or date_to.replace(day=1) - relativedelta(months=11)
+
+        domain = [('date', '>=', date_from), ('date', '<=', date_to), ('is_total', '=', group_by != 'genre')]
+        groupby = [f'date:{granularity}'] + ([group_by] if group_by else [])
+        groups = self.sudo()._read_group(domain, groupby, ['rental_count:sum'])
+
+        # Every bucket of the range gets a label, also the empty ones
+        step = {
+            'day': relativedelta(days=1),
+            'week': relativedelta(weeks=1),
+            'month': relativedelta(months=1),
+            'year': relativedelta(years=1),
+        }[granularity]
+        bucket = {
+            'day': date_from,
+            'week': date_from - timedelta(days=date_from.weekday()),
+            'month': date_from.replace(day=1),
+            'year': date_from.replace(month=1, day=1),
+        }[granularity]
+        buckets = []
+        while bucket <= date_to:
+            buckets.append(bucket)
+            bucket += step
+        index = {bucket: position for position, bucket in enumerate(buckets)}
+
+        series = {}
+        for group in groups:
+            bucket, key, count = (group[0], group[1], group[2]) if group_by else (group[0], 'total', group[1])
+            data = series.setdefault(key or 'none', [0] * len(buckets))
+            if bucket in index:
+                data[index[bucket]] += count
+
+        if group_by:
+            source = self.env['library.rental'] if group_by == 'state' else self.env['library.book']
+            labels = dict(source._fields[group_by].selection)
+        else:
+            labels = {'total': 'Rentals'}
+        label_format = {'day': '%Y-%m-%d', 'week': 'W%V %G', 'month': '%b %Y', 'year': '%Y'}[granularity]
+        return {
+            'labels': [bucket.strftime(label_format) for bucket in buckets],
+            'datasets': [
+                {'key': key, 'label': labels.get(key, 'Undefined'), 'data': data}
+                for key, data in series.items()
+            ],
+        }
@@ -0,0 +1,130 @@
+from odoo import models, api
+from odoo.tools import SQL
+from odoo.tools.sql import escape_psql
+from .library_book import normalize_isbn
+
+
+class LibrarySearch(models.AbstractModel):
+    _name = 'library.search'
+    _description = 'Ranked catalogue and member search'
+
+    @api.model
+    def _run_ranked(self, model, candidates, domain, offset, limit):
+        """Rank the ids returned by the ``candidates`` queries and return ``(records, total)``.
+
+        Each candidate query selects ``(id, score)``, a record keeps its best
+        score. ``domain`` is applied on top, record rules included.
+        """
+        Model = self.env[model]
+        Model.check_access('read')
+        self.env.cr.execute(SQL(
+            """
+            SELECT matches.id, COUNT(*) OVER ()
+              FROM (%(candidates)s) AS matches (id, score)
+             WHERE matches.id IN %(allowed)s
+          GROUP BY matches.id
+          ORDER BY MAX(matches.score) DESC, matches.id
+             LIMIT %(limit)s OFFSET %(offset)s
+            """,
+            candidates=SQL(" UNION ALL ").join(candidates),
+            allowed=Model._search(domain or []).subselect(),
+            limit=limit,
+            offset=offset,
+        ))
+        rows = self.env.cr.fetchall()
+        return Model.browse([row[0] for row in rows]), rows[0][1] if rows else 0
+
+    @api.model
+    def _text_match(self, table, column, query, weight=1.0, join=None):
+        # Trigram similarity when pg_trgm is there, both operators use the GIN trigram index
+        pattern = f"%{escape_psql(query)}%"
+        source = SQL("%s AS t", SQL.identifier(table))
+        record_id = SQL("t.id")
+        if join:
+            source = SQL("%s JOIN library_book AS b ON b.%s = t.id", source, SQL.identifier(join))
+            record_id = SQL("b.id")
+        field = SQL("t.%s", SQL.identifier(column))
+        if self.env.registry.has_trigram:
+            # The trigram operator goes in as its own fragment, a literal %% in a code with arguments is collapsed
+            return SQL(
+                "SELECT %s, similarity(%s, %s) * %s FROM %s WHERE %s %s %s OR %s ILIKE %s",
+                record_id, field, query, weight, source, field, SQL("%%"), query, field, pattern,
+            )
+        return SQL("SELECT %s, %s FROM %s WHERE %s ILIKE %s", record_id, weight, source, field, pattern)
+
+    @api.model
+    def _search_books(self, query, domain=None, offset=0, limit=20):
+        """Books matching ``query`` on title, author, ISBN or genre, best match first.
+
+        Titles and author names are matched with trigram similarity, so typos
+        still find the book. Returns ``(books, total)``.
+        """
+        query = (query or '').strip()
+        if not query:
+            return self.env['library.book'], 0
+        candidates = [
+            self._text_match('library_book', 'title', query),
+            self._text_match('library_author', 'name', query, weight=0.8, join='author_id'),
+        ]
+        isbn = normalize_isbn(query)
+        if isbn:
+            candidates.append(SQL("SELECT id, 2.0 FROM library_book WHERE isbn = %s", isbn))
+        genres = [key for key, label in self.env['library.book']._fields['genre'].selection
+                  if query.casefold() in (key, label.casefold())]
+        if genres:
+            candidates.append(SQL("SELECT id, 0.5 FROM library_book WHERE genre IN %s", tuple(genres)))
+        return self._run_ranked('library.book', candidates, domain, offset, limit)
+
+    @api.model
+    def _search_members(self, query, domain=None, offset=0, limit=20):
+        """Members matching ``query`` on name, email or membership ID, best match first."""
+        query = (query or '').strip()
+        if not query:
+            return self.env['library.member'], 0
+        candidates = [
+            self._text_match('library_member', 'name', query),
+            self._text_match('library_member', 'email', query, weight=0.9),
+            self._text_match('library_member', 'membership_id', query),
+        ]
+        return self._run_ranked('library.member', candidates, domain, offset, limit)
+
+    @api.model
+    def _closest_names(self, model, column, queries):
+        """Map each of ``queries`` to the closest ``column`` value of ``model``, one query for all.
+
+        Used to suggest a fix for names that do not match exactly. Queries with
+        no close value are left out.
+        """
+        queries = sorted({query.strip() for query in queries if query and query.strip()})
+        if not queries:
+            return {}
+        Model = self.env[model]
+        Model.check_access('read')
+        field = SQL("t.%s", SQL.identifier(column))
+        if self.env.registry.has_trigram:
+            match = SQL("(%s %s q.value OR %s ILIKE q.pattern)", field, SQL("%%"), field)
+            order = SQL("similarity(%s, q.value) DESC, t.id", field)
+        else:
+            match = SQL("%s ILIKE q.pattern", field)
+            order = SQL("t.id")
+        self.env.cr.execute(SQL(
+            """
+            SELECT q.value, m.name
+              FROM unnest(%(values)s::text[], %(patterns)s::text[]) AS q (value, pattern)
+        CROSS JOIN LATERAL (
+                   SELECT %(field)s AS name
+                     FROM %(table)s AS t
+                    WHERE %(match)s AND t.id IN %(allowed)s
+                 ORDER BY %(order)s
+                    LIMIT 1
+               ) AS m
+            """,
+            values=queries,
+            patterns=[f"%{escape_psql(query)}%" for query in queries],
+            field=field,
+            table=SQL.identifier(Model._table),
+            match=match,
+            allowed=Model._search([]).subselect(),
+            order=order,
+        ))
+        return dict(self.env.cr.fetchall())
@@ -0,0 +1,41 @@
+from odoo import models, fields, api
+
+
+class LibrarySequence(models.Model):
+    _name = 'library.sequence'
+    _description = 'Library number counter'
+
+    code = fields.Char(string="Code", required=True)
+    last_number = fields.Integer(string="Last Number")
+
+    _sql_constraints = [
+        ('code_unique', 'unique(code)', "The counter code must be unique."),
+    ]
+
+    @api.model
+    def _reserve(self, code, count=1, seed=None):
+        """Reserve ``count`` consecutive numbers for ``code`` and return the first one.
+
+        The counter row stays locked until the transaction ends, so concurrent
+        workers always get disjoint blocks. ``seed`` returns the last number
+        already in use and is only called the first time a code is seen.
+        """
+        cr = self.env.cr
+        cr.execute("""
+            UPDATE library_sequence
+               SET last_number = last_number + %s
+             WHERE code = %s
+         RETURNING last_number
+        """, (count, code))
+        row = cr.fetchone()
+        if not row:
+            start = seed() if seed else 0
+            cr.execute("""
+                INSERT INTO library_sequence (code, last_number)
+                     VALUES (%s, %s)
+                ON CONFLICT (code)
+                  DO UPDATE SET last_number = library_sequence.last_number + %s
+                  RETURNING last_number
+            """, (code, start + count, count))
+            row = cr.fetchone()
+        return row[0] - count + 1
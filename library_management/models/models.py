@@ -1,6 +1,6 @@
 from odoo import models, fields, api
 from odoo.exceptions import UserError
-from werkzeug.urls import url_encode
+from .rental_export import PDF_CHUNK_SIZE
 import base64
 
 
@@ -12,6 +12,8 @@ class RentalReportWizard(models.TransientModel):
     end_date = fields.Date(string="End Date")
     add_data = fields.Binary(string="Import Data")
     file_name = fields.Char(string="File Name")
+    dry_run = fields.Boolean(string="Dry Run", help="Only validate the file and report the invalid rows.")
+    import_report = fields.Text(string="Import Report", readonly=True)
     export_file = fields.Binary(string='Download File', readonly=True)
     export_file_name = fields.Char(string="File Name")
     count_data = fields.Integer(string="Data count" ,compute="_compute_data_count")
@@ -82,93 +84,44 @@ class RentalReportWizard(models.TransientModel):
             if not wizard.add_data:
                 raise UserError("Please upload a file.")
 
-            file_name = (wizard.file_name or "").lower()
-            file_content = base64.b64decode(wizard.add_data)
-
-            if file_name.endswith('.csv'):
-                import csv
-                from io import StringIO
-                # Handle CSV
-                csv_data = csv.reader(StringIO(file_content.decode('utf-8')))
-                for row in csv_data:
-                    print("\n",row,"\n")  # Process CSV row here
-                    # create record logic...
-
-            elif file_name.endswith('.xlsx'):
-                import openpyxl
-                from io import BytesIO
-                # Handle Excel .xlsx
-                workbook = openpyxl.load_workbook(filename=BytesIO(file_content))
-                sheet = workbook.active
-                for row in sheet.iter_rows(min_row=2, values_only=True):  # skip header
-                    book_titles_raw = row[0]
-                    due_date = row[1]
-                    member = row[2]
-                    rental_date = row[3]
-                    rental_fee = row[4]
-                    return_date = row[5]
-                    status = row[6]
-                    member_id =0
-                    if member:
-                        member_id = self.env['library.member'].search([('name', '=', member)], limit=1)
-                    # Convert titles to book IDs
-                    book_ids_list = []
-                    if book_titles_raw:
-                        book_titles = [title.strip() for title in str(book_titles_raw).split(',')]
-                        for title in book_titles:
-                            book = self.env['library.book'].search([('title', '=', title)], limit=1)
-                            if book:
-                                book_ids_list.append(book.id)
-                            else:
-                                raise UserError(f"Book with title '{title}' not found.")
-
-                    # Create rental record
-                    self.env['library.rental'].create({
-                        'member_id': member_id.id,
-                        'book_ids': [(6, 0, book_ids_list)],
-                        'rental_date': rental_date,
-                        'due_date': due_date,
-                        'return_date': return_date,
-                        'rental_fee': rental_fee,
-                        'state': status.lower(),
-                    })
-
+            Import = self.env['library.rental.import']
+            report = Import._import(base64.b64decode(wizard.add_data), wizard.file_name, dry_run=wizard.dry_run)
+            if wizard.dry_run:
+                summary = f"Dry run: {report['rows']} row(s) checked, {len(report['errors'])} error(s)."
             else:
-                raise UserError("Unsupported file format. Please upload CSV or XLSX file.")
-            # ✅ return action to keep the wizard open
-
-    def action_export_data(self):
-        # Generate URL with params
-        base_url = '/library/export_rental_xlsx?'
-        # Start building query parameters
-        query_params = {}
-        # Add start and end date if they exist
-        if self.start_date:
-            query_params['start_date'] = str(self.start_date)
-        if self.end_date:
-            query_params['end_date'] = str(self.end_date)
-        # Add state only if onchange_status() returns something
-        state_list = self.onchange_status()
-        if state_list:
-            query_params['state'] = ','.join(state_list)
-        # Now encode the final query string
-        query = url_encode(query_params)
-        full_url = base_url + query
+                summary = f"{report['created']} rental(s) imported."
+            if report['errors']:
+                summary += "\n" + Import._format_errors(report['errors'])
+            wizard.import_report = summary
 
+        # return action to keep the wizard open
         return {
-            'type': 'ir.actions.act_url',
-            'url': full_url,
-            'target': 'self',
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
         }
 
+    def action_export_data(self):
+        # The file is built by a background job, identical recent exports are reused
+        job = self.env['library.rental.export.job']._enqueue(self.start_date, self.end_date, self.onchange_status())
+        return job.action_refresh()
+
 
     def action_generate_report(self):
         if self.count_data <1:
             raise UserError("No data to generate!")
+        states = self.onchange_status()
+        if self.count_data > PDF_CHUNK_SIZE:
+            # Large reports are rendered in chunks by a background job
+            job = self.env['library.rental.export.job']._enqueue(self.start_date, self.end_date, states, file_format='pdf')
+            return job.action_refresh()
         data = {
             'form': {
                 'start_date': self.start_date,
                 'end_date': self.end_date,
+                'states': states,
             }
         }
         return self.env.ref('library_management.action_rental_report_pdf').report_action(self, data=data)
@@ -183,12 +136,27 @@ class LibraryRentalReturnWizard(models.TransientModel):
     rental_ids = fields.Many2many('library.rental', string='Rentals to Return', required=True)
 
     def confirm_returns(self):
-        for rental in self.rental_ids:
-            if rental.state not in ('active', 'overdue'):
-                raise UserError("Only Active or Overdue rentals can be returned.")
-            if rental.return_date and rental.return_date < rental.rental_date:
-                raise UserError("Can't return, Check rental date and current date.")
-            rental.state = 'returned'
-            rental.return_date = fields.Date.today()
+        # Validated and written together, one chatter summary per member
+        self.rental_ids._bulk_return()
         return {'type': 'ir.actions.act_window_close'}
 
+
+
+class LibraryCatalogueImportWizard(models.TransientModel):
+    _name = 'library.catalogue.import.wizard'
+    _description = 'Library Catalogue Import Wizard'
+
+    add_data = fields.Binary(string="Catalogue File", required=True)
+    file_name = fields.Char(string="File Name")
+
+    def action_load_catalogue(self):
+        # Large feeds do not fit in a request, a background job loads them in committed chunks
+        self.ensure_one()
+        job = self.env['library.catalogue.import.job']._enqueue(base64.b64decode(self.add_data), self.file_name)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': job._name,
+            'res_id': job.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
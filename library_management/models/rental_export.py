@@ -0,0 +1,263 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from odoo.tools import SQL
+from odoo.tools.pdf import merge_pdf
+import openpyxl
+import tempfile
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment
+from datetime import timedelta
+
+EXPORT_HEADERS = ['Book', 'Due Date', 'Member', 'Rental Date', 'Rental Fee', 'Return Date', 'Status']
+MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+# Marks the immutable snapshots of closed periods, followed by their data version
+SNAPSHOT_TAG = 'library_management.snapshot'
+# Rentals per rendered PDF chunk, larger reports are built in the background
+PDF_CHUNK_SIZE = 1000
+
+
+class RentalExport(models.AbstractModel):
+    _name = 'library.rental.export'
+    _description = 'Rental report export'
+
+    @api.model
+    def _get_domain(self, start_date=None, end_date=None, states=None):
+        domain = []
+        if start_date and end_date:
+            domain.append(('rental_date', '>=', start_date))
+            domain.append(('rental_date', '<=', end_date))
+        if states:
+            domain.append(('state', 'in', list(states)))
+        return domain
+
+    @api.model
+    def _iter_rows(self, domain, batch_size=5000):
+        """Yield the rentals matching ``domain`` as flat dicts.
+
+        Rentals are read in keyset-paginated ``search_read`` chunks and the
+        book titles and fees of each chunk come from one join, so memory does
+        not grow with the number of rows.
+        """
+        Rental = self.env['library.rental'].sudo()
+        last_id = 0
+        while True:
+            records = Rental.search_read(
+                list(domain) + [('id', '>', last_id)],
+                ['name', 'due_date', 'member_id', 'rental_date', 'return_date', 'state'],
+                order='id',
+                limit=batch_size,
+            )
+            if not records:
+                return
+            rental_ids = [record['id'] for record in records]
+            books = self._get_book_info(rental_ids)
+            for record in records:
+                titles, fee = books.get(record['id'], ('', 0.0))
+                yield {
+                    'id': record['id'],
+                    'name': record['name'],
+                    'books': titles,
+                    'due_date': record['due_date'],
+                    'member': record['member_id'][1] if record['member_id'] else '',
+                    'rental_date': record['rental_date'],
+                    'rental_fee': fee or 0.0,
+                    'return_date': record['return_date'],
+                    'state': record['state'],
+                }
+            last_id = rental_ids[-1]
+            # Drop the chunk from the cache to keep memory flat
+            self.env.invalidate_all()
+
+    @api.model
+    def _get_book_info(self, rental_ids):
+        # Book titles and summed fees of the given rentals, from one join
+        book_field = self.env['library.rental']._fields['book_ids']
+        self.env.cr.execute(SQL(
+            """
+            SELECT rel.%(rental_col)s, string_agg(b.title, ', ' ORDER BY b.title), SUM(b.rental_fee)
+              FROM %(rel)s rel
+              JOIN library_book b ON b.id = rel.%(book_col)s
+             WHERE rel.%(rental_col)s = ANY(%(ids)s)
+          GROUP BY rel.%(rental_col)s
+            """,
+            rel=SQL.identifier(book_field.relation),
+            rental_col=SQL.identifier(book_field.column1),
+            book_col=SQL.identifier(book_field.column2),
+            ids=list(rental_ids),
+        ))
+        return {rental_id: (titles, fee) for rental_id, titles, fee in self.env.cr.fetchall()}
+
+    @api.model
+    def _get_data_version(self, domain):
+        """Version of the report of ``domain``, as one string.
+
+        Changes whenever a matching rental, one of its books (titles and fees
+        are in the report) or one of its fee lines is created, written or
+        deleted.
+        """
+        Rental = self.env['library.rental'].sudo()
+        self.env['library.book'].flush_model(['write_date'])
+        self.env['library.rental.fee'].flush_model(['rental_id', 'write_date'])
+        book_field = Rental._fields['book_ids']
+        self.env.cr.execute(SQL(
+            """
+            WITH r AS (SELECT id, write_date FROM library_rental WHERE id IN %(rental_ids)s)
+            SELECT (SELECT COUNT(*) FROM r),
+                   (SELECT MAX(write_date) FROM r),
+                   (SELECT MAX(b.write_date)
+                      FROM %(rel)s rel
+                      JOIN library_book b ON b.id = rel.%(book_col)s
+                     WHERE rel.%(rental_col)s IN (SELECT id FROM r)),
+                   (SELECT COUNT(*) || '/' || COALESCE(MAX(f.write_date)::varchar, '')
+                      FROM library_rental_fee f
+                     WHERE f.rental_id IN (SELECT id FROM r))
+            """,
+            rental_ids=Rental._search(domain).subselect(),
+            rel=SQL.identifier(book_field.relation),
+            rental_col=SQL.identifier(book_field.column1),
+            book_col=SQL.identifier(book_field.column2),
+        ))
+        return ':'.join(str(value or '') for value in self.env.cr.fetchone())
+
+    @api.model
+    def _write_xlsx(self, fileobj, domain, progress=None, progress_step=5000):
+        """Write the rental report of ``domain`` to ``fileobj`` with openpyxl's write-only mode.
+
+        ``progress`` is called with the number of rows written every
+        ``progress_step`` rows. Returns the number of rentals written.
+        """
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet('Rental Report')
+        for column in 'ABCDEFG':
+            ws.column_dimensions[column].width = 30
+        ws.append(EXPORT_HEADERS)
+
+        wrap_alignment = Alignment(wrap_text=True)
+        count = 0
+        for row in self._iter_rows(domain):
+            book_cell = WriteOnlyCell(ws, value=row['books'])
+            if row['books']:
+                book_cell.alignment = wrap_alignment
+            ws.append([book_cell, row['due_date'], row['member'], row['rental_date'],
+                       row['rental_fee'], row['return_date'], row['state']])
+            count += 1
+            if progress and count % progress_step == 0:
+                progress(count)
+        wb.save(fileobj)
+        return count
+
+    @api.model
+    def _get_totals(self, domain):
+        """Rental count per state and total fee of ``domain``, aggregated in SQL."""
+        Rental = self.env['library.rental'].sudo()
+        state_labels = dict(Rental._fields['state']._description_selection(self.env))
+        by_state = [(state_labels.get(state, state), count) for state, count in Rental._read_group(domain, ['state'], ['__count'])]
+        book_field = Rental._fields['book_ids']
+        self.env.cr.execute(SQL(
+            """
+            SELECT COALESCE(SUM(b.rental_fee), 0)
+              FROM %(rel)s rel
+              JOIN library_book b ON b.id = rel.%(book_col)s
+             WHERE rel.%(rental_col)s IN %(rental_ids)s
+            """,
+            rel=SQL.identifier(book_field.relation),
+            rental_col=SQL.identifier(book_field.column1),
+            book_col=SQL.identifier(book_field.column2),
+            rental_ids=Rental._search(domain).subselect(),
+        ))
+        return {
+            'count': sum(count for __, count in by_state),
+            'fee': self.env.cr.fetchone()[0],
+            'by_state': by_state,
+        }
+
+    @api.model
+    def _render_pdf(self, domain, start_date=None, end_date=None, progress=None, chunk_size=PDF_CHUNK_SIZE):
+        """Render the rental report of ``domain`` as one PDF.
+
+        Rentals are rendered ``chunk_size`` at a time so wkhtmltopdf never lays
+        out the whole period at once, then the chunks are merged. The totals
+        are computed once in SQL and printed after the last chunk.
+        """
+        report = self.env.ref('library_management.action_rental_report_pdf').sudo()
+        rental_ids = self.env['library.rental'].sudo().search(domain, order='id').ids
+        totals = self._get_totals(domain)
+        chunks = [rental_ids[start:start + chunk_size] for start in range(0, len(rental_ids), chunk_size)] or [[]]
+
+        pdfs = []
+        for index, chunk in enumerate(chunks):
+            data = {'form': {
+                'start_date': start_date,
+                'end_date': end_date,
+                'rental_ids': chunk,
+                'first': index == 0,
+                'totals': totals if index == len(chunks) - 1 else None,
+            }}
+            pdfs.append(report._render_qweb_pdf(report.report_name, data=data)[0])
+            if progress:
+                progress(index * chunk_size + len(chunk))
+            self.env.invalidate_all()
+        return merge_pdf(pdfs) if len(pdfs) > 1 else pdfs[0]
+
+    @api.model
+    def _is_closed_period(self, start_date, end_date):
+        # Whole months that are over, their report no longer changes
+        start_date, end_date = fields.Date.to_date(start_date), fields.Date.to_date(end_date)
+        return bool(
+            start_date and end_date and start_date.day == 1 and start_date <= end_date
+            and (end_date + timedelta(days=1)).day == 1 and end_date < fields.Date.today()
+        )
+
+    @api.model
+    def _get_file_name(self, start_date=None, end_date=None, states=None, file_format='xlsx'):
+        return "rental_report_{}_{}{}.{}".format(
+            start_date or 'all', end_date or 'all', '_' + '-'.join(sorted(states)) if states else '', file_format)
+
+    @api.model
+    def _build_attachment(self, start_date=None, end_date=None, states=None, progress=None, file_format='xlsx', **values):
+        """Build the XLSX or PDF report of these parameters into a new attachment.
+
+        ``values`` are added to the attachment, e.g. the record it belongs to.
+        """
+        domain = self._get_domain(start_date, end_date, states)
+        with tempfile.TemporaryFile() as fp:
+            if file_format == 'pdf':
+                fp.write(self._render_pdf(domain, start_date, end_date, progress=progress))
+            else:
+                self._write_xlsx(fp, domain, progress=progress)
+            fp.seek(0)
+            return self.env['ir.attachment'].sudo().create(dict({
+                'name': self._get_file_name(start_date, end_date, states, file_format),
+                'raw': fp.read(),
+                'mimetype': MIMETYPES[file_format],
+            }, **values))
+
+    @api.model
+    def _get_snapshot(self, start_date, end_date, states=None, progress=None, file_format='xlsx', build=True, data_version=None):
+        """Attachment holding the report of a closed period at its current data version.
+
+        Rentals of a closed month still change (returns, the overdue cron,
+        edits), so a snapshot is keyed by the period and the data version of
+        its rentals and a new one is built when the version moves. Snapshots
+        are never replaced, so mails and jobs referencing an older one keep
+        their file. Returns an empty recordset when the snapshot is missing
+        and ``build`` is False. Other ranges go through library.rental.export.job.
+        """
+        if not self._is_closed_period(start_date, end_date):
+            raise UserError(f"Only whole past months are kept as snapshots, not {start_date} - {end_date}.")
+        name = self._get_file_name(start_date, end_date, states, file_format)
+        version = data_version or self._get_data_version(self._get_domain(start_date, end_date, states))
+        description = f"{SNAPSHOT_TAG}:{version}"
+        Attachment = self.env['ir.attachment'].sudo()
+        snapshot = Attachment.search([
+            ('res_model', '=', 'library.rental'), ('name', '=', name), ('description', '=', description),
+        ], order='id desc', limit=1)
+        if snapshot or not build:
+            return snapshot
+        return self._build_attachment(
+            start_date, end_date, states, progress=progress, file_format=file_format,
+            res_model='library.rental', description=description,
+        )
@@ -0,0 +1,170 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from datetime import timedelta
+import contextlib
+import logging
+import threading
+
+_logger = logging.getLogger(__name__)
+
+
+class RentalExportJob(models.Model):
+    _name = 'library.rental.export.job'
+    _description = 'Background rental export'
+    _order = 'id desc'
+
+    name = fields.Char(string="Name", compute='_compute_name')
+    start_date = fields.Date(string="Start Date")
+    end_date = fields.Date(string="End Date")
+    states = fields.Char(string="States", help="Comma separated rental states, empty for all.")
+    file_format = fields.Selection([('xlsx', 'Excel'), ('pdf', 'PDF')], string="Format", default='xlsx', required=True)
+    params_key = fields.Char(string="Parameters Key", index=True, readonly=True)
+    data_version = fields.Char(string="Data Version", readonly=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string="Status", default='queued', required=True, index=True)
+    rows_total = fields.Integer(string="Total Rows", readonly=True)
+    rows_done = fields.Integer(string="Rows Done", readonly=True)
+    progress = fields.Float(string="Progress", compute='_compute_progress')
+    attachment_id = fields.Many2one('ir.attachment', string="File", readonly=True, ondelete='set null')
+    error = fields.Text(string="Error", readonly=True)
+    user_id = fields.Many2one('res.users', string="Requested by", default=lambda self: self.env.user)
+
+    @api.depends('start_date', 'end_date', 'states', 'file_format')
+    def _compute_name(self):
+        for job in self:
+            period = f"{job.start_date or '...'} - {job.end_date or '...'}"
+            kind = "Rental PDF report" if job.file_format == 'pdf' else "Rental export"
+            job.name = f"{kind} {period}" + (f" ({job.states})" if job.states else "")
+
+    @api.depends('rows_done', 'rows_total', 'state')
+    def _compute_progress(self):
+        for job in self:
+            if job.state == 'done':
+                job.progress = 100.0
+            else:
+                job.progress = 100.0 * job.rows_done / job.rows_total if job.rows_total else 0.0
+
+    @api.model
+    def _make_params_key(self, start_date, end_date, states, file_format='xlsx'):
+        return f"{start_date or ''}|{end_date or ''}|{','.join(sorted(states or []))}|{file_format}"
+
+    def _get_domain(self):
+        self.ensure_one()
+        states = self.states.split(',') if self.states else None
+        return self.env['library.rental.export']._get_domain(self.start_date, self.end_date, states)
+
+    @api.model
+    def _enqueue(self, start_date=None, end_date=None, states=None, file_format='xlsx'):
+        """Job building the export of these parameters.
+
+        A finished job is reused while no rental of the range changed, and an
+        identical job still in the queue is returned instead of a new one.
+        """
+        key = self._make_params_key(start_date, end_date, states, file_format)
+        domain = self.env['library.rental.export']._get_domain(start_date, end_date, states)
+        version = self.env['library.rental.export']._get_data_version(domain)
+
+        done = self.search([
+            ('params_key', '=', key),
+            ('data_version', '=', version),
+            ('state', '=', 'done'),
+            ('attachment_id', '!=', False),
+        ], limit=1)
+        if done:
+            return done
+        pending = self.search([('params_key', '=', key), ('state', 'in', ('queued', 'running'))], limit=1)
+        if pending:
+            return pending
+
+        job = self.create({
+            'start_date': start_date,
+            'end_date': end_date,
+            'states': ','.join(sorted(states or [])),
+            'file_format': file_format,
+            'params_key': key,
+        })
+        self.env.ref('library_management.ir_cron_process_export_jobs')._trigger()
+        return job
+
+    @api.model
+    def _cron_process_jobs(self, limit=5):
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+
+        # Jobs whose worker died are put back in the queue
+        stale = self.search([('state', '=', 'running'), ('write_date', '<', fields.Datetime.now() - timedelta(hours=1))])
+        stale.write({'state': 'queued', 'rows_done': 0})
+
+        for job in self.search([('state', '=', 'queued')], order='id', limit=limit):
+            job._run(auto_commit)
+
+    def _run(self, auto_commit=True):
+        self.ensure_one()
+        Export = self.env['library.rental.export']
+        domain = self._get_domain()
+
+        def commit():
+            if auto_commit:
+                self.env.cr.commit()
+
+        self.write({
+            'state': 'running',
+            'rows_done': 0,
+            'rows_total': self.env['library.rental'].sudo().search_count(domain),
+            'data_version': Export._get_data_version(domain),
+            'error': False,
+        })
+        commit()
+
+        def progress(count):
+            self.rows_done = count
+            commit()
+
+        try:
+            # Progress commits on its own, without commits a savepoint keeps the transaction usable on failure
+            with contextlib.nullcontext() if auto_commit else self.env.cr.savepoint():
+                states = self.states.split(',') if self.states else None
+                if Export._is_closed_period(self.start_date, self.end_date):
+                    attachment = Export._get_snapshot(
+                        self.start_date, self.end_date, states, progress=progress, file_format=self.file_format,
+                        data_version=self.data_version)
+                else:
+                    # Other ranges belong to the job, so its download outlives newer exports
+                    attachment = Export._build_attachment(
+                        self.start_date, self.end_date, states, progress=progress, file_format=self.file_format,
+                        res_model=self._name, res_id=self.id)
+            self.write({'state': 'done', 'rows_done': self.rows_total, 'attachment_id': attachment.id})
+        except Exception as e:
+            if auto_commit:
+                self.env.cr.rollback()
+            _logger.exception("Rental export job %s failed", self.id)
+            self.write({'state': 'failed', 'error': str(e)})
+        commit()
+
+    def _get_download_url(self):
+        # Snapshots are shared and owned by the cron, the controller checks the rights and reads them as sudo
+        self.ensure_one()
+        return f"/library/export_job/{self.id}/download"
+
+    def action_download(self):
+        self.ensure_one()
+        if self.state != 'done' or not self.attachment_id:
+            raise UserError("The export is not ready yet.")
+        return {
+            'type': 'ir.actions.act_url',
+            'url': self._get_download_url(),
+            'target': 'self',
+        }
+
+    def action_refresh(self):
+        # Reopen the form to show the current progress
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
@@ -0,0 +1,201 @@
+from odoo import models, fields, api
+from odoo.exceptions import UserError
+from datetime import date, datetime
+import csv
+import io
+import openpyxl
+
+# Column order shared with the XLSX export
+IMPORT_COLUMNS = ['books', 'due_date', 'member', 'rental_date', 'rental_fee', 'return_date', 'state']
+
+# Rentals in these states are lent a copy of each of their books on create
+OPEN_STATES = ('confirmed', 'active', 'overdue')
+
+
+class RentalImport(models.AbstractModel):
+    _name = 'library.rental.import'
+    _description = 'Rental bulk import'
+
+    @api.model
+    def _iter_file(self, file_content, file_name):
+        """Yield ``(row number, values)`` for every row of a CSV or XLSX file, header included."""
+        file_name = (file_name or '').lower()
+        if file_name.endswith('.csv'):
+            stream = io.TextIOWrapper(io.BytesIO(file_content), encoding='utf-8-sig', newline='')
+            yield from enumerate(csv.reader(stream), start=1)
+        elif file_name.endswith('.xlsx'):
+            workbook = openpyxl.load_workbook(filename=io.BytesIO(file_content), read_only=True, data_only=True)
+            try:
+                yield from enumerate(workbook.active.iter_rows(values_only=True), start=1)
+            finally:
+                workbook.close()
+        else:
+            raise UserError("Unsupported file format. Please upload CSV or XLSX file.")
+
+    @api.model
+    def _iter_rows(self, file_content, file_name):
+        # Data rows only, the first row is the header
+        for number, row in self._iter_file(file_content, file_name):
+            if number > 1:
+                yield number, row
+
+    @api.model
+    def _to_date(self, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        value = str(value or '').strip()
+        return fields.Date.to_date(value[:10]) if value else False
+
+    @api.model
+    def _import(self, file_content, file_name, dry_run=False, chunk_size=1000):
+        """Validate and import rentals, one bulk member/book lookup and one create per chunk.
+
+        Every row is validated and reported, an open rental also needs a free
+        copy of each of its books. Nothing is created on a dry run,
+        and a real run is rolled back as a whole when any row is invalid.
+        Returns ``{'rows': int, 'created': int, 'errors': [(row number, message)]}``.
+        """
+        report = {'rows': 0, 'created': 0, 'errors': []}
+        # Copies claimed by rows that were checked but not created, by book and by (member, book) hold
+        claimed = {}
+        chunk = []
+        for number, row in self._iter_rows(file_content, file_name):
+            if not any(cell not in (None, '') for cell in row):
+                continue
+            chunk.append((number, dict(zip(IMPORT_COLUMNS, list(row) + [None] * len(IMPORT_COLUMNS)))))
+            if len(chunk) >= chunk_size:
+                self._import_chunk(chunk, dry_run, report, claimed)
+                chunk = []
+        if chunk:
+            self._import_chunk(chunk, dry_run, report, claimed)
+
+        if report['errors'] and not dry_run:
+            raise UserError("Nothing was imported, fix these rows first:\n" + self._format_errors(report['errors']))
+        return report
+
+    @api.model
+    def _import_chunk(self, chunk, dry_run, report, claimed=None):
+        Rental = self.env['library.rental']
+        claimed = {} if claimed is None else claimed
+        states = dict(Rental._fields['state'].selection)
+
+        # One lookup per chunk for all member names and book titles
+        titles_by_row = {
+            number: [title.strip() for title in str(values['books'] or '').split(',') if title.strip()]
+            for number, values in chunk
+        }
+        member_names = {str(values['member']).strip() for __, values in chunk if values['member']}
+        titles = {title for row_titles in titles_by_row.values() for title in row_titles}
+        members = {}
+        for member in self.env['library.member'].search_read([('name', 'in', list(member_names))], ['name'], order='id desc'):
+            members[member['name']] = member['id']
+        books = {}
+        for book in self.env['library.book'].search_read([('title', 'in', list(titles))], ['title'], order='id desc'):
+            books[book['title']] = book['id']
+        Search = self.env['library.search']
+        suggestions = {
+            'library.member': Search._closest_names('library.member', 'name', member_names - set(members)),
+            'library.book': Search._closest_names('library.book', 'title', titles - set(books)),
+        }
+        free, held = self._get_free_copies(list(books.values()), list(members.values()))
+
+        vals_list = []
+        for number, values in chunk:
+            report['rows'] += 1
+            errors = []
+            member_name = str(values['member'] or '').strip()
+            if not member_name:
+                errors.append("Member is missing.")
+            elif member_name not in members:
+                errors.append(f"Member '{member_name}' not found." + self._suggest(suggestions['library.member'], member_name))
+            row_titles = titles_by_row[number]
+            if not row_titles:
+                errors.append("Book is missing.")
+            for title in row_titles:
+                if title not in books:
+                    errors.append(f"Book with title '{title}' not found." + self._suggest(suggestions['library.book'], title))
+            state = str(values['state'] or 'draft').strip().lower()
+            if state not in states:
+                errors.append(f"Unknown status '{values['state']}'.")
+            try:
+                rental_date = self._to_date(values['rental_date'])
+                due_date = self._to_date(values['due_date'])
+                return_date = self._to_date(values['return_date'])
+            except ValueError:
+                errors.append("Dates must be in YYYY-MM-DD format.")
+            else:
+                if not rental_date or not due_date:
+                    errors.append("Rental date and due date are required.")
+                elif rental_date > due_date:
+                    errors.append("Due date must be after the rental date.")
+                elif return_date and return_date < rental_date:
+                    errors.append("Return date must be after the rental date.")
+
+            if not errors and state in OPEN_STATES:
+                # An open rental is lent a copy of each book, the member's kept copy first
+                member_id = members[member_name]
+                for title in row_titles:
+                    book_id = books[title]
+                    if held.get((member_id, book_id), 0) > claimed.get((member_id, book_id), 0):
+                        claimed[member_id, book_id] = claimed.get((member_id, book_id), 0) + 1
+                    elif free.get(book_id, 0) > claimed.get(book_id, 0):
+                        claimed[book_id] = claimed.get(book_id, 0) + 1
+                    else:
+                        errors.append(f"No copy of '{title}' is available.")
+
+            if errors:
+                report['errors'].extend((number, error) for error in errors)
+                continue
+            vals_list.append({
+                'member_id': members[member_name],
+                'book_ids': [(6, 0, [books[title] for title in row_titles])],
+                'rental_date': rental_date,
+                'due_date': due_date,
+                'return_date': return_date,
+                'state': state,
+            })
+
+        if vals_list and not dry_run and not report['errors']:
+            Rental.with_context(tracking_disable=True).create(vals_list)
+            report['created'] += len(vals_list)
+            self.env.invalidate_all()
+            # The created rentals hold their copies now, the next chunk counts them as lent
+            claimed.clear()
+
+    @api.model
+    def _get_free_copies(self, book_ids, member_ids):
+        """Return ``(free, held)``: shelf copies by book and kept copies by (member, book)."""
+        if not book_ids:
+            return {}, {}
+        self.env['library.book.copy'].flush_model(['book_id', 'status'])
+        self.env.cr.execute("""
+            SELECT book_id, COUNT(*)
+              FROM library_book_copy
+             WHERE book_id = ANY(%s) AND status = 'available'
+          GROUP BY book_id
+        """, (book_ids,))
+        free = dict(self.env.cr.fetchall())
+        held = {}
+        holds = self.env['library.book.hold'].search([
+            ('member_id', 'in', member_ids), ('book_id', 'in', book_ids),
+            ('state', '=', 'ready'), ('copy_id', '!=', False),
+        ])
+        for hold in holds:
+            key = (hold.member_id.id, hold.book_id.id)
+            held[key] = held.get(key, 0) + 1
+        return free, held
+
+    @api.model
+    def _suggest(self, matches, value):
+        # Closest existing name, looked up once per chunk, to spot typos in the file
+        match = matches.get(value)
+        return f" Did you mean '{match}'?" if match else ""
+
+    @api.model
+    def _format_errors(self, errors, limit=50):
+        lines = [f"Row {number}: {message}" for number, message in errors[:limit]]
+        if len(errors) > limit:
+            lines.append(f"... and {len(errors) - limit} more error(s).")
+        return "\n".join(lines)
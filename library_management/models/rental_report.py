@@ -8,23 +8,30 @@ class RentalReport(models.AbstractModel):
 
     @api.model
     def _get_report_values(self, docids, data=None):
-        docs = self.env['library.rental'].browse(docids)
+        # Rows are read flat, the template never walks the rental records
+        Export = self.env['library.rental.export']
+        form = (data or {}).get('form') or {}
+        if 'rental_ids' in form:
+            # One chunk of a merged report, totals are only passed to the last one
+            domain = [('id', 'in', form['rental_ids'])]
+            totals = form.get('totals')
+        else:
+            if form:
+                domain = Export._get_domain(form.get('start_date'), form.get('end_date'), form.get('states'))
+            else:
+                domain = [('id', 'in', docids)]
+            totals = Export._get_totals(domain)
+        rows = list(Export._iter_rows(domain))
 
-        start_date = None
-        end_date = None
-
-        if data and data.get('form'):
-            start_date = data['form'].get('start_date')
-            end_date = data['form'].get('end_date')
-            docs = self.env['library.rental'].search([
-                ('rental_date', '>=', start_date),
-                ('rental_date', '<=', end_date)
-            ])
         return {
             'doc_ids': docids,
             'doc_model': 'library.rental',
-            'docs': docs,
-            'start_date': start_date,
-            'end_date': end_date,
+            'rows': rows,
+            'totals': totals,
+            'single': not form and len(rows) == 1,
+            'show_header': form.get('first', True),
+            'currency': self.env.company.currency_id,
+            'start_date': form.get('start_date'),
+            'end_date': form.get('end_date'),
             'data': data,
-        }
\ No newline at end of file
+        }
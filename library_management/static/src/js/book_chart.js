@@ -1,30 +1,75 @@
-odoo.define('library_management.book_chart', function (require) {
+(function () {
     'use strict';
 
-    document.addEventListener('DOMContentLoaded', function () {
-        const ctx = document.getElementById('doughnutChart');
-        if (!ctx) return;
+    const COLORS = ['#36A2EB', '#FF6384', '#FFCE56', '#4BC0C0', '#9966FF', '#FF9F40'];
 
-        // Dummy data (replace with real data later)
-        const data = {
-            labels: ['Fiction', 'Non-Fiction', 'Sci-Fi'],
-            datasets: [{
-                data: [12, 19, 7],
-                backgroundColor: ['#FF6384', '#36A2EB', '#FFCE56'],
-            }]
-        };
-
-        new Chart(ctx, {
-            type: 'doughnut',
-            data: data,
-            options: {
-                responsive: true,
-                plugins: {
-                    legend: {
-                        position: 'bottom'
-                    }
-                }
+    // Series come from /library/chart/rentals, which reads the daily rollup
+    function fetchSeries(canvas) {
+        const params = new URLSearchParams();
+        ['granularity', 'groupBy', 'dateFrom', 'dateTo'].forEach(function (key) {
+            if (canvas.dataset[key]) {
+                params.set(key.replace(/[A-Z]/g, function (c) { return '_' + c.toLowerCase(); }), canvas.dataset[key]);
             }
         });
-    });
-});
+        return fetch(canvas.dataset.url + '?' + params.toString(), {credentials: 'same-origin'})
+            .then(function (response) { return response.json(); });
+    }
+
+    function renderTrend(canvas) {
+        fetchSeries(canvas).then(function (series) {
+            new Chart(canvas, {
+                type: 'line',
+                data: {
+                    labels: series.labels,
+                    datasets: series.datasets.map(function (dataset, index) {
+                        return {
+                            label: dataset.label,
+                            data: dataset.data,
+                            borderColor: COLORS[index % COLORS.length],
+                            tension: 0.3,
+                        };
+                    }),
+                },
+                options: {
+                    responsive: true,
+                    plugins: {legend: {position: 'bottom'}},
+                },
+            });
+        });
+    }
+
+    function renderBreakdown(canvas) {
+        fetchSeries(canvas).then(function (series) {
+            new Chart(canvas, {
+                type: 'doughnut',
+                data: {
+                    labels: series.datasets.map(function (dataset) { return dataset.label; }),
+                    datasets: [{
+                        data: series.datasets.map(function (dataset) {
+                            return dataset.data.reduce(function (a, b) { return a + b; }, 0);
+                        }),
+                        backgroundColor: COLORS,
+                    }],
+                },
+                options: {
+                    responsive: true,
+                    plugins: {legend: {position: 'bottom'}},
+                },
+            });
+        });
+    }
+
+    function init() {
+        if (typeof Chart === 'undefined') return;
+        const trend = document.getElementById('trendChart');
+        if (trend) renderTrend(trend);
+        const state = document.getElementById('stateChart');
+        if (state) renderBreakdown(state);
+    }
+
+    if (document.readyState === 'loading') {
+        document.addEventListener('DOMContentLoaded', init);
+    } else {
+        init();
+    }
+})();
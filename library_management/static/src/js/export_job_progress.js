@@ -0,0 +1,55 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+import { ProgressBarField, progressBarField } from "@web/views/fields/progress_bar/progress_bar_field";
+import { onMounted, onWillUnmount } from "@odoo/owl";
+
+const POLL_INTERVAL = 2000;
+const PENDING_STATES = ["queued", "running"];
+
+// Progress bar of an export job that follows /library/export_job/<id>/progress while the job runs
+export class ExportJobProgressField extends ProgressBarField {
+    setup() {
+        super.setup();
+        onMounted(() => this.schedule());
+        onWillUnmount(() => {
+            this.stopped = true;
+            clearTimeout(this.timer);
+        });
+    }
+
+    schedule() {
+        clearTimeout(this.timer);
+        this.timer = setTimeout(() => this.poll(), POLL_INTERVAL);
+    }
+
+    async poll() {
+        const record = this.props.record;
+        if (this.stopped || !record.resId || !PENDING_STATES.includes(record.data.state)) {
+            return;
+        }
+        try {
+            const response = await fetch(`/library/export_job/${record.resId}/progress`, {credentials: "same-origin"});
+            const job = await response.json();
+            // The record is only reloaded when the job moved, so idle polls cost one small request
+            if (!this.stopped && (job.state !== record.data.state || job.rows_done !== record.data.rows_done)) {
+                await record.model.load();
+            }
+            if (!PENDING_STATES.includes(job.state)) {
+                return;
+            }
+        } catch {
+            // A dropped request is retried on the next tick
+        }
+        if (!this.stopped) {
+            this.schedule();
+        }
+    }
+}
+
+export const exportJobProgressField = {
+    ...progressBarField,
+    component: ExportJobProgressField,
+};
+
+registry.category("fields").add("export_job_progress", exportJobProgressField);
@@ -0,0 +1,3 @@
+from . import test_library_search
+from . import test_checkout_concurrency
+from . import test_rental_reminders
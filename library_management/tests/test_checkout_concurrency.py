@@ -0,0 +1,155 @@
+"""Parallel checkout harness, run against a real PostgreSQL database.
+
+Every worker thread has its own cursor and commits, like concurrent desks.
+Not part of the standard run, start it with::
+
+    odoo-bin -d <db> -u library_management --test-tags library_concurrency --stop-after-init
+"""
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+import psycopg2.errors
+
+from odoo import api, fields, SUPERUSER_ID
+from odoo.exceptions import UserError
+from odoo.modules.registry import Registry
+from odoo.tests.common import BaseCase, get_db_name, tagged
+
+WORKERS = 8
+ROUNDS = 25
+TITLES = 4
+COPIES_PER_TITLE = 3
+MAX_TRIES = 3
+# Checkouts touch no shared row (rental numbers come from nextval, counters and
+# rollup rows are appended), a retry is only left when a copy is picked under a
+# snapshot taken before another desk lent or returned it
+MAX_RETRY_RATE = 0.02
+MAX_LATENCY = 5.0
+RETRYABLE = (psycopg2.errors.SerializationFailure, psycopg2.errors.DeadlockDetected)
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('-standard', 'library_concurrency')
+class TestCheckoutConcurrency(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.registry = Registry(get_db_name())
+        with self.registry.cursor() as cr:
+            # Barcodes and membership IDs come from these counters, they are put back afterwards
+            cr.execute("SELECT code, last_number FROM library_sequence")
+            self.counters = dict(cr.fetchall())
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            books = env['library.book'].create([{'title': f"Concurrency {index}"} for index in range(TITLES)])
+            # One copy comes with each title
+            env['library.book.copy'].create([
+                {'book_id': book.id} for book in books for __ in range(COPIES_PER_TITLE - 1)
+            ])
+            members = env['library.member'].create([
+                {'name': f"Desk {index}", 'email': f"desk{index}@example.com"} for index in range(WORKERS)
+            ])
+            self.book_ids, self.member_ids = books.ids, members.ids
+        self.addCleanup(self._cleanup)
+
+    def _cleanup(self):
+        with self.registry.cursor() as cr:
+            cr.execute("SELECT id FROM library_rental WHERE member_id = ANY(%s)", (self.member_ids,))
+            rental_ids = [row[0] for row in cr.fetchall()]
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            Rollup = env['library.rental.rollup']
+            Rollup._apply(Rollup._get_contributions(rental_ids), {})
+            # Events and rentals cannot be deleted through the ORM once written
+            cr.execute("DELETE FROM library_circulation_event WHERE book_id = ANY(%s) OR member_id = ANY(%s) OR rental_id = ANY(%s)",
+                       (self.book_ids, self.member_ids, rental_ids))
+            cr.execute("DELETE FROM library_rental_fee WHERE book_id = ANY(%s)", (self.book_ids,))
+            cr.execute("DELETE FROM library_rental WHERE id = ANY(%s)", (rental_ids,))
+            cr.execute("DELETE FROM library_book_counter WHERE book_id = ANY(%s)", (self.book_ids,))
+            cr.execute("DELETE FROM library_book WHERE id = ANY(%s)", (self.book_ids,))
+            cr.execute("DELETE FROM library_member WHERE id = ANY(%s)", (self.member_ids,))
+            cr.execute("DELETE FROM library_sequence WHERE NOT code = ANY(%s)", (list(self.counters),))
+            for code, last_number in self.counters.items():
+                cr.execute("UPDATE library_sequence SET last_number = %s WHERE code = %s", (last_number, code))
+
+    def _run(self, func):
+        """Run ``func(env)`` in its own committed transaction, retrying like the HTTP layer.
+
+        Returns ``(outcome, tries, seconds)``.
+        """
+        started = time.monotonic()
+        for tries in range(1, MAX_TRIES + 1):
+            try:
+                with self.registry.cursor() as cr:
+                    func(api.Environment(cr, SUPERUSER_ID, {}))
+                return 'ok', tries, time.monotonic() - started
+            except UserError:
+                return 'unavailable', tries, time.monotonic() - started
+            except RETRYABLE:
+                time.sleep(random.uniform(0.0, 0.01 * 2 ** tries))
+        return 'failed', MAX_TRIES, time.monotonic() - started
+
+    def _worker(self, member_id, results):
+        today = fields.Date.today()
+        rng = random.Random(member_id)
+        for __ in range(ROUNDS):
+            book_id = rng.choice(self.book_ids)
+            rental_ids = []
+
+            def checkout(env):
+                # A retried attempt must not keep the id of a rolled back rental
+                rental_ids[:] = []
+                rental = env['library.rental'].with_context(tracking_disable=True).create({
+                    'member_id': member_id,
+                    'book_ids': [(6, 0, [book_id])],
+                    'rental_date': today,
+                    'due_date': today + timedelta(days=7),
+                    'state': 'active',
+                })
+                rental_ids.extend(rental.ids)
+
+            outcome = self._run(checkout)
+            results.append(('checkout',) + outcome)
+            if outcome[0] == 'ok':
+                results.append(('return',) + self._run(lambda env: env['library.rental'].browse(rental_ids)._bulk_return()))
+
+    def test_parallel_checkouts(self):
+        results = []
+        threads = [threading.Thread(target=self._worker, args=(member_id, results)) for member_id in self.member_ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        checkouts = [result for result in results if result[0] == 'checkout']
+        self.assertEqual(len(checkouts), WORKERS * ROUNDS)
+        self.assertFalse([result for result in results if result[1] == 'failed'], "Some requests ran out of retries.")
+        self.assertTrue([result for result in checkouts if result[1] == 'ok'], "No checkout went through.")
+        retries = sum(result[2] - 1 for result in results)
+        self.assertLessEqual(retries, MAX_RETRY_RATE * len(results), f"{retries} serialization retries in {len(results)} requests.")
+        latencies = sorted(result[3] for result in results)
+        self.assertLess(latencies[-1], MAX_LATENCY, f"Slowest request took {latencies[-1]:.2f}s.")
+
+        with self.registry.cursor() as cr:
+            # A copy never goes from borrowed to borrowed, every lend follows a give back
+            cr.execute("""
+                SELECT COUNT(*)
+                  FROM (SELECT new_state, LAG(new_state) OVER (PARTITION BY copy_id ORDER BY id) AS previous
+                          FROM library_circulation_event
+                         WHERE event_type = 'copy' AND book_id = ANY(%s)) events
+                 WHERE new_state = 'borrowed' AND previous = 'borrowed'
+            """, (self.book_ids,))
+            self.assertEqual(cr.fetchone()[0], 0, "A copy was lent twice.")
+            # Everything was given back and the counters agree with the copies
+            env = api.Environment(cr, SUPERUSER_ID, {})
+            books = env['library.book'].browse(self.book_ids)
+            self.assertEqual(env['library.book.copy'].search_count([('book_id', 'in', books.ids), ('status', '!=', 'available')]), 0)
+            self.assertEqual(books.mapped('copies_available'), [COPIES_PER_TITLE] * TITLES)
+
+        _logger.info(
+            "%s requests, %s retries, median %.0f ms, p95 %.0f ms, max %.0f ms",
+            len(results), retries, latencies[len(latencies) // 2] * 1000,
+            latencies[int(len(latencies) * 0.95)] * 1000, latencies[-1] * 1000,
+        )
@@ -0,0 +1,36 @@
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('post_install', '-at_install')
+class TestLibrarySearch(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = cls.env['library.author'].create({'name': 'Frank Herbert'})
+        cls.book = cls.env['library.book'].create({'title': 'Dune Messiah', 'author_id': author.id, 'isbn': '9780441172696'})
+        cls.other = cls.env['library.book'].create({'title': 'Foundation'})
+        cls.member = cls.env['library.member'].create({'name': 'Ada Lovelace', 'email': 'ada@example.com'})
+
+    def test_search_books(self):
+        Search = self.env['library.search']
+        books, total = Search._search_books('Messiah')
+        self.assertIn(self.book, books)
+        self.assertNotIn(self.other, books)
+        self.assertEqual(total, len(books))
+        # Author and ISBN matches run their own candidate query
+        self.assertIn(self.book, Search._search_books('Herbert')[0])
+        self.assertEqual(Search._search_books('978-0-441-17269-6')[0][:1], self.book)
+
+    def test_search_books_typo(self):
+        if not self.env.registry.has_trigram:
+            self.skipTest("pg_trgm is not installed")
+        self.assertIn(self.book, self.env['library.search']._search_books('Dune Mesiah')[0])
+
+    def test_name_search(self):
+        self.assertIn(self.book.id, [book_id for book_id, __ in self.env['library.book'].name_search('Messiah')])
+        self.assertIn(self.member.id, [member_id for member_id, __ in self.env['library.member'].name_search('Lovelace')])
+
+    def test_search_members(self):
+        members, __ = self.env['library.search']._search_members('ada@example')
+        self.assertIn(self.member, members)
@@ -0,0 +1,103 @@
+import socketserver
+import threading
+from datetime import timedelta
+from email import message_from_bytes
+from unittest.mock import patch
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+
+class SmtpSink(socketserver.StreamRequestHandler):
+    """Just enough SMTP to accept mails, every mail is kept on the server."""
+
+    def reply(self, line):
+        self.wfile.write(line + b"\r\n")
+
+    def handle(self):
+        self.reply(b"220 sink")
+        recipients, data = [], None
+        for line in self.rfile:
+            if data is not None:
+                if line.rstrip(b"\r\n") == b".":
+                    self.server.messages.append((recipients, message_from_bytes(b"".join(data))))
+                    recipients, data = [], None
+                    self.reply(b"250 OK")
+                else:
+                    data.append(line[1:] if line.startswith(b".") else line)
+                continue
+            command = line[:4].upper()
+            if command == b"RCPT":
+                recipients.append(line.split(b":", 1)[1].split()[0].strip(b"<>").decode())
+            elif command == b"DATA":
+                data = []
+                self.reply(b"354 End data with <CR><LF>.<CR><LF>")
+                continue
+            elif command == b"RSET":
+                recipients = []
+            elif command == b"QUIT":
+                self.reply(b"221 Bye")
+                return
+            self.reply(b"250 OK")
+
+
+@tagged('post_install', '-at_install')
+class TestRentalReminders(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        today = fields.Date.today()
+        books = cls.env['library.book'].create([{'title': f"Reminder {index}"} for index in range(3)])
+        cls.members = cls.env['library.member'].create([
+            {'name': 'Grace Hopper', 'email': 'grace@example.com'},
+            {'name': 'Alan Turing', 'email': 'alan@example.com'},
+        ])
+        grace, alan = cls.members
+        # Grace has an overdue and a soon-due rental, both go in one digest
+        cls.env['library.rental'].with_context(tracking_disable=True).create([
+            {'member_id': grace.id, 'book_ids': [(6, 0, books[0].ids)], 'state': 'active',
+             'rental_date': today - timedelta(days=10), 'due_date': today - timedelta(days=2)},
+            {'member_id': grace.id, 'book_ids': [(6, 0, books[1].ids)], 'state': 'active',
+             'rental_date': today - timedelta(days=5), 'due_date': today + timedelta(days=1)},
+            {'member_id': alan.id, 'book_ids': [(6, 0, books[2].ids)], 'state': 'active',
+             'rental_date': today - timedelta(days=5), 'due_date': today + timedelta(days=2)},
+        ])
+
+    def setUp(self):
+        super().setUp()
+        self.sink = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SmtpSink)
+        self.sink.daemon_threads = True
+        self.sink.messages = []
+        threading.Thread(target=self.sink.serve_forever, daemon=True).start()
+        self.addCleanup(self.sink.server_close)
+        self.addCleanup(self.sink.shutdown)
+        self.mail_server = self.env['ir.mail_server'].create({
+            'name': 'SMTP sink',
+            'smtp_host': '127.0.0.1',
+            'smtp_port': self.sink.server_address[1],
+            'smtp_encryption': 'none',
+            'sequence': 0,
+        })
+
+    def test_one_mail_per_member_and_period(self):
+        Notification = self.env['library.rental.notification']
+        Notification._cron_send_reminders()
+        # A second run in the same period finds every member already notified
+        Notification._cron_send_reminders()
+        notifications = Notification.search([('member_id', 'in', self.members.ids)])
+        self.assertEqual(sorted(notifications.member_id.ids), sorted(self.members.ids))
+        self.assertEqual(len(set(notifications.mapped('period'))), 1)
+
+        mails = notifications.mail_id
+        self.assertEqual(len(mails), len(self.members))
+        mails.mail_server_id = self.mail_server
+        # Test mode never opens an SMTP connection, the sink is a real one
+        with patch.object(type(self.env['ir.mail_server']), '_is_test_mode', return_value=False):
+            mails.send(raise_exception=True)
+
+        recipients = sorted(recipient for rcpt, __ in self.sink.messages for recipient in rcpt)
+        self.assertEqual(recipients, sorted(self.members.mapped('email')))
+        subjects = {rcpt[0]: message['Subject'] for rcpt, message in self.sink.messages}
+        self.assertEqual(subjects['grace@example.com'], "Overdue books: 2 rental(s)")
+        self.assertEqual(subjects['alan@example.com'], "Books due soon: 1 rental(s)")